@@ -0,0 +1,221 @@
+# -*- coding: utf-8 -*-
+# benchmark.py - module for measuring frame times of the game
+# Copyright (C) 2017, 2018  Nguyễn Gia Phong
+#
+# This file is part of Brutal Maze.
+#
+# Brutal Maze is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# Brutal Maze is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with Brutal Maze.  If not, see <https://www.gnu.org/licenses/>.
+
+__doc__ = 'Brutal Maze module for measuring frame times of the game'
+
+import json
+import os
+from argparse import ArgumentParser, FileType
+from math import pi
+from platform import python_version
+from sys import stderr, stdout
+from time import perf_counter
+
+# Nothing is shown or played during the benchmark, and nothing
+# but the results is printed to stdout
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+os.environ.setdefault('SDL_AUDIODRIVER', 'dummy')
+os.environ.setdefault('PYGAME_HIDE_SUPPORT_PROMPT', '1')
+import pygame
+
+from . import maze as maze_module
+from .characters import Enemy
+from .constants import INIT_SCORE
+from .game import __version__, ConfigReader, Game
+from .graphics import Canvas
+from .maze import Maze
+from .protocol import PROTOCOLS
+from .weapons import BULLET_COLORS
+
+# Name, screen size, number of enemies and number of bullets on display
+SCENARIOS = (('small', (640, 480), 4, 0),
+             ('default', (640, 480), 8, 16),
+             ('crowded', (1280, 720), 24, 32),
+             ('bullet-hell', (1280, 720), 8, 256),
+             ('large', (1920, 1080), 16, 64))
+# Timed methods and functions by their phase names, along with the classes
+# or modules they are looked up from
+PHASES = (('is_valid_move', Maze, 'is_valid_move'), ('rotate', Maze, 'rotate'),
+          ('wake', Enemy, 'wake'),
+          ('enemy_update', maze_module, 'update_enemies'),
+          ('slash', Maze, 'slash'), ('track_bullets', Maze, 'track_bullets'),
+          ('draw', Canvas, 'draw'))
+
+
+class Timer:
+    """Object accumulating time spent in each phase.
+
+    Attributes:
+        phases (dict): lists of durations of calls by phase names
+    """
+    def __init__(self):
+        self.phases = {}
+
+    def wrap(self, name, function):
+        """Return the function whose calls are timed as the phase."""
+        durations = self.phases.setdefault(name, [])
+        def timed(*args, **kwargs):
+            start = perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                durations.append(perf_counter() - start)
+        return timed
+
+    def __enter__(self):
+        self.originals = [(cls, attr, getattr(cls, attr))
+                          for _, cls, attr in PHASES]
+        for name, cls, attr in PHASES:
+            setattr(cls, attr, self.wrap(name, getattr(cls, attr)))
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        for cls, attr, function in self.originals: setattr(cls, attr, function)
+
+
+def summarize(durations, frames):
+    """Return statistics of the durations (in seconds) as a dict,
+    with times converted to microseconds.
+    """
+    if not durations: return {'calls': 0, 'total': 0.0, 'per_frame': 0.0}
+    durations = sorted(durations)
+    total = sum(durations)
+    return {'calls': len(durations), 'total': total * 1e6,
+            'per_frame': total / frames * 1e6,
+            'mean': total / len(durations) * 1e6,
+            'median': durations[len(durations) // 2] * 1e6,
+            'p99': durations[int(len(durations) * 0.99)] * 1e6,
+            'max': durations[-1] * 1e6}
+
+
+def script(frame):
+    """Return the scripted control input of the hero for the frame,
+    as arguments of Game.control.
+    """
+    # Walk in eight directions in turns, sweep the aim around the hero,
+    # fire most of the time and slash once in a while.
+    direction = frame // 120 % 8
+    x, y = ((1, 0), (1, 1), (0, 1), (-1, 1),
+            (-1, 0), (-1, -1), (0, -1), (1, -1))[direction]
+    return x, y, frame * pi / 90, frame % 4 != 0, frame % 60 < 10
+
+
+def populate(maze, enemies):
+    """Spawn enemies until there are the given number of them."""
+    maze.score = INIT_SCORE ** enemies
+    maze.add_enemy()
+
+
+def spray(maze, bullets):
+    """Add random bullets until there are the given number of them."""
+    rng = maze.rng
+    while len(maze.bullets) < bullets:
+        maze.bullets.append(rng.uniform(0, maze.w), rng.uniform(0, maze.h),
+                            rng.uniform(-pi, pi), rng.choice(BULLET_COLORS))
+
+
+def run(config, scenario, frames, seed, protocol):
+    """Run the scenario for the given number of frames and return
+    its results as a dict.
+    """
+    name, size, enemies, bullets = scenario
+    config.size, config.seed = size, seed
+    export = PROTOCOLS[protocol]()
+    frame_times, export_times = [], []
+    with Game(config) as game, Timer() as timer:
+        maze = game.maze
+        for frame in range(frames):
+            # Keep the hero alive to maintain the workload
+            maze.hero.wound = 0.0
+            populate(maze, enemies)
+            spray(maze, bullets)
+            start = perf_counter()
+            game.control(*script(frame))
+            game.step()
+            game.canvas.draw()
+            middle = perf_counter()
+            export(maze)
+            end = perf_counter()
+            frame_times.append(end - start)
+            export_times.append(end - middle)
+    phases = {name: summarize(durations, frames)
+              for name, durations in timer.phases.items()}
+    phases['export'] = summarize(export_times, frames)
+    frame = summarize(frame_times, frames)
+    return {'name': name, 'size': size, 'enemies': enemies,
+            'bullets': bullets, 'frames': frames, 'seed': seed,
+            'protocol': protocol, 'fps': frames * 1e6 / frame['total'],
+            'frame': frame, 'phases': phases}
+
+
+def compare(results, baseline, file=stdout):
+    """Print the ratios of time per frame of each phase between results
+    and the baseline, for scenarios of the same names, to the file.
+    """
+    old = {scenario['name']: scenario for scenario in baseline['scenarios']}
+    for scenario in results['scenarios']:
+        name = scenario['name']
+        if name not in old: continue
+        print('{}: frame {:.2f}x'.format(
+            name, scenario['frame']['mean'] / old[name]['frame']['mean']),
+              file=file)
+        for phase, stats in sorted(scenario['phases'].items()):
+            before = old[name]['phases'].get(phase, {}).get('per_frame')
+            if before and stats['per_frame']:
+                print('    {}: {:.2f}x'.format(
+                    phase, stats['per_frame'] / before), file=file)
+
+
+def main():
+    """Run benchmark scenarios and write results as JSON."""
+    names = [scenario[0] for scenario in SCENARIOS]
+    parser = ArgumentParser(usage='%(prog)s [options]')
+    parser.add_argument(
+        '-n', '--frames', type=int, default=1000,
+        help='number of frames of each scenario (default: 1000)')
+    parser.add_argument('--seed', type=int, default=42,
+                        help='seed of the random generator (default: 42)')
+    parser.add_argument('-p', '--protocol', choices=sorted(PROTOCOLS),
+                        default='text', help='export format (default: text)')
+    parser.add_argument('-s', '--scenario', action='append', choices=names,
+                        help='scenarios to be run (default: all)')
+    parser.add_argument('-o', '--output', type=FileType('w'), default=stdout,
+                        metavar='PATH', help='where results are written')
+    parser.add_argument('--compare', type=FileType('r'), metavar='PATH',
+                        help='results of a previous run to compare with')
+    args = parser.parse_args()
+
+    config = ConfigReader([])
+    config.parse()
+    config.muted, config.server, config.headless = True, False, False
+
+    scenarios = [scenario for scenario in SCENARIOS
+                 if args.scenario is None or scenario[0] in args.scenario]
+    results = {'version': __version__, 'python': python_version(),
+               'pygame': pygame.version.ver, 'scenarios': [
+                   run(config, scenario, args.frames, args.seed, args.protocol)
+                   for scenario in scenarios]}
+    json.dump(results, args.output, indent=2, sort_keys=True)
+    args.output.write('\n')
+    if args.compare is not None:
+        compare(results, json.load(args.compare),
+                stderr if args.output is stdout else stdout)
+
+
+if __name__ == '__main__': main()
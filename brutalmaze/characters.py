@@ -19,23 +19,21 @@
 
 __doc__ = 'Brutal Maze module for hero and enemy classes'
 
-from math import atan, atan2, sin, pi
-from random import choice, randrange, shuffle
+from math import atan2, ceil, floor, sin, pi
 from sys import modules
 
 from .constants import (
     TANGO, HERO_HP, SFX_HEART, HEAL_SPEED, MIN_BEAT, ATTACK_SPEED, ENEMY,
     ENEMY_SPEED, ENEMY_HP, SFX_SLASH_HERO, MIDDLE, WALL, FIRANGE, AROUND_HERO,
     ADJACENT_GRIDS, EMPTY, FG_COLOR, SQRT2, MINW)
-from .misc import sign, cosin, randsign, regpoly, fill_aapolygon, choices, play
-from .weapons import Bullet
+from .misc import sign, randsign, choices
 
 
 class Hero:
     """Object representing the hero.
 
     Attributes:
-        surface (pygame.Surface): the display to draw on
+        maze (Maze): the maze
         x, y (int): coordinates of the center of the hero (in pixels)
         angle (float): angle of the direction the hero pointing (in radians)
         color (tuple of pygame.Color): colors of the hero on different HPs
@@ -49,22 +47,22 @@ class Hero:
         spin_speed (float): speed of spinning (in frames per slash)
         spin_queue (float): frames left to finish spinning
         wound (float): amount of wound
-        sfx_heart (pygame.mixer.Sound): heart beat sound effect
+        sfx_heart (str): heart beat sound effect
     """
-    def __init__(self, surface, fps, maze_size):
-        self.surface = surface
-        w, h = maze_size
-        self.x, self.y = w >> 1, h >> 1
-        self.angle, self.color = -pi * 3 / 4, TANGO['Aluminium']
-        self.R = (w * h / sin(pi*2/3) / 624) ** 0.5
+    def __init__(self, maze, fps, maze_size):
+        self.maze, self.color = maze, TANGO['Aluminium']
+        self.resize(maze_size)
+        self.reset(fps)
+        self.sfx_heart = SFX_HEART
 
+    def reset(self, fps):
+        """Bring the hero back to the state at the start of a game."""
+        self.angle = -pi * 3 / 4
         self.next_heal = self.next_beat = self.next_strike = 0.0
         self.slashing = self.firing = self.dead = False
         self.spin_speed = fps / HERO_HP
         self.spin_queue = self.wound = 0.0
 
-        self.sfx_heart = SFX_HEART
-
     def update(self, fps):
         """Update the hero."""
         if self.dead:
@@ -79,7 +77,7 @@ class Hero:
         else:
             self.next_heal -= 1000.0 / fps
         if self.next_beat <= 0:
-            play(self.sfx_heart)
+            self.maze.play(self.sfx_heart)
             self.next_beat = MIN_BEAT*(2 - self.wound/HERO_HP)
         else:
             self.next_beat -= 1000.0 / fps
@@ -88,7 +86,7 @@ class Hero:
         full_spin = pi * 2 / self.get_sides()
         if self.slashing and self.next_strike <= 0:
             self.next_strike = ATTACK_SPEED
-            self.spin_queue = randsign() * self.spin_speed
+            self.spin_queue = randsign(self.maze.rng) * self.spin_speed
             self.angle -= sign(self.spin_queue) * full_spin
         if round(self.spin_queue) != 0:
             self.angle += sign(self.spin_queue) * full_spin / self.spin_speed
@@ -116,10 +114,10 @@ class Hero:
         """Return current color of the hero."""
         return self.color[int(self.wound)]
 
-    def draw(self):
-        """Draw the hero."""
-        trigon = regpoly(self.get_sides(), self.R, self.angle, self.x, self.y)
-        fill_aapolygon(self.surface, trigon, self.get_color())
+    def draw(self, surface, sprites):
+        """Draw the hero on the surface using the given SpriteCache."""
+        sprites.draw(surface, self.get_sides(), self.R, self.angle,
+                     self.x, self.y, self.get_color())
 
     def resize(self, maze_size):
         """Resize the hero."""
@@ -143,12 +141,20 @@ class Enemy:
         spin_speed (float): speed of spinning (in frames per slash)
         spin_queue (float): frames left to finish spinning
         wound (float): amount of wound
-        sfx_slash (pygame.mixer.Sound): sound effect of slashed hero
+        sfx_slash (str): sound effect of slashed hero
+
+    Class attributes:
+        speed (float): speed of movement (in grids per second)
+        ranged (bool): flag indicates if the enemy shoots
+        hiding (bool): flag indicates if the enemy fades out of sight
+            over time
     """
+    speed, ranged, hiding = ENEMY_SPEED, True, False
+
     def __init__(self, maze, x, y, color):
         self.maze = maze
         self.x, self.y = x, y
-        self.maze.map[x][y] = ENEMY
+        self.maze.map[x, y] = ENEMY
         self.angle, self.color = pi / 4, color
 
         self.awake = False
@@ -172,11 +178,17 @@ class Enemy:
         """
         return self.maze.get_distance(*self.get_pos())
 
+    def is_visible(self):
+        """Return whether the enemy can be seen."""
+        return True
+
     def place(self, x=0, y=0):
         """Move the enemy by (x, y) (in grids)."""
+        if self.awake: self.maze.unindex_enemy(self)
         self.x += x
         self.y += y
-        self.maze.map[self.x][self.y] = ENEMY
+        self.maze.map[self.x, self.y] = ENEMY
+        if self.awake: self.maze.index_enemy(self)
 
     def wake(self):
         """Wake the enemy up if it can see the hero.
@@ -185,60 +197,52 @@ class Enemy:
         has just woken it, False otherwise.
         """
         if self.awake: return None
-        startx = starty = MIDDLE
-        stopx, stopy, distance = self.x, self.y, self.maze.distance
-        if startx > stopx: startx, stopx = stopx, startx
-        if starty > stopy: starty, stopy = stopy, starty
-        dx = (self.x-MIDDLE)*distance + self.maze.centerx - self.maze.x
-        dy = (self.y-MIDDLE)*distance + self.maze.centery - self.maze.y
-        mind = cosin(abs(atan(dy / dx)) if dx else 0) * distance
-        def get_distance(x, y): return abs(dy*x - dx*y) / (dy**2 + dx**2)**0.5
-        for i in range(startx, stopx + 1):
+        maze, distance = self.maze, self.maze.distance
+        ox, oy = maze.centerx - maze.x, maze.centery - maze.y
+        startx, stopx = sorted((MIDDLE, self.x))
+        starty, stopy = sorted((MIDDLE, self.y))
+        dx, dy = (self.x-MIDDLE)*distance + ox, (self.y-MIDDLE)*distance + oy
+        if not dx:
             for j in range(starty, stopy + 1):
-                if self.maze.map[i][j] != WALL: continue
-                x, y = self.maze.get_pos(i, j)
-                if get_distance(x - self.maze.x, y - self.maze.y) <= mind:
-                    return False
+                if maze.map[self.x, j] == WALL: return False
+        else:
+            # A wall blocks the sight if its center is closer to the line
+            # of sight than (1+|slope|) grids vertically, so instead of
+            # the whole bounding box, only a thick ray is traversed.
+            slope = dy / dx
+            rows = 1 + abs(slope)
+            reach = rows * distance
+            for i in range(startx, stopx + 1):
+                y = slope*((i-MIDDLE)*distance + ox) - oy
+                center = y/distance + MIDDLE
+                for j in range(max(starty, int(floor(center - rows))),
+                               min(stopy, int(ceil(center + rows))) + 1):
+                    if (maze.map[i, j] == WALL
+                        and abs(y - (j-MIDDLE)*distance) <= reach):
+                        return False
         self.awake = True
-        play(self.maze.sfx_spawn,
-             1 - self.get_distance()/self.maze.get_distance(0, 0)/2,
-             self.get_angle() + pi)
-        return True
-
-    def fire(self):
-        """Return True if the enemy has just fired, False otherwise."""
-        if self.maze.hero.dead: return False
-        x, y = self.get_pos()
-        if (self.maze.get_distance(x, y) > FIRANGE*self.maze.distance
-            or self.next_strike > 0
-            or (self.x, self.y) in AROUND_HERO or self.offsetx or self.offsety
-            or randrange((self.maze.hero.slashing+self.maze.isfast()+1) * 3)):
-            return False
-        self.next_strike = ATTACK_SPEED
-        self.maze.bullets.append(
-            Bullet(self.maze.surface, x, y, self.get_angle() + pi, self.color))
+        self.maze.index_enemy(self)
+        self.maze.play(self.maze.sfx_spawn,
+                       1 - self.get_distance()/self.maze.get_distance(0, 0)/2,
+                       self.get_angle() + pi)
         return True
 
-    def move(self, speed=ENEMY_SPEED):
-        """Return True if it has just moved, False otherwise."""
-        if self.offsetx:
-            self.offsetx -= sign(self.offsetx)
-            return True
-        if self.offsety:
-            self.offsety -= sign(self.offsety)
-            return True
-        if self.next_strike > 0: return False
-
-        self.move_speed = self.maze.fps / speed
+    def move(self):
+        """Start moving to an adjacent grid, from the center of
+        the current one, and return True if it is possible, otherwise
+        return False.
+        """
+        self.move_speed = self.maze.fps / self.speed
         directions = [(sign(MIDDLE - self.x), 0), (0, sign(MIDDLE - self.y))]
-        shuffle(directions)
-        directions.append(choice(ADJACENT_GRIDS))
-        if self.maze.hero.dead: directions = choice(ADJACENT_GRIDS),
+        rng = self.maze.rng
+        rng.shuffle(directions)
+        directions.append(rng.choice(ADJACENT_GRIDS))
+        if self.maze.hero.dead: directions = rng.choice(ADJACENT_GRIDS),
         for x, y in directions:
-            if (x or y) and self.maze.map[self.x + x][self.y + y] == EMPTY:
+            if (x or y) and self.maze.map[self.x + x, self.y + y] == EMPTY:
                 self.offsetx = round(x * (1 - self.move_speed))
                 self.offsety = round(y * (1 - self.move_speed))
-                self.maze.map[self.x][self.y] = EMPTY
+                self.maze.map[self.x, self.y] = EMPTY
                 self.place(x, y)
                 return True
         return False
@@ -268,28 +272,20 @@ class Enemy:
         return TANGO[self.color][int(self.wound)] if self.awake else FG_COLOR
 
 
-    def draw(self):
-        """Draw the enemy."""
-        if self.maze.next_move > 0 and not self.awake: return
+    def draw(self, surface, sprites, dx=0.0, dy=0.0):
+        """Draw the enemy, moved by (dx, dy), on the surface using
+        the given SpriteCache if it is awake, otherwise it is drawn
+        along with the walls.
+        """
+        if not self.awake: return
         radius = self.maze.distance/SQRT2 - self.awake*2
-        square = regpoly(4, radius, self.angle, *self.get_pos())
-        fill_aapolygon(self.maze.surface, square, self.get_color())
+        x, y = self.get_pos()
+        sprites.draw(surface, 4, radius, self.angle, x + dx, y + dy,
+                     self.get_color())
 
     def update(self):
         """Update the enemy."""
-        if self.awake:
-            self.spin_speed, tmp = self.maze.fps / ENEMY_HP, self.spin_speed
-            self.spin_queue *= self.spin_speed / tmp
-            self.next_strike -= 1000.0 / self.maze.fps
-            if not self.spin_queue and not self.fire() and not self.move():
-                self.spin_queue = randsign() * self.spin_speed
-                if not self.maze.hero.dead:
-                    play(self.sfx_slash, self.get_slash(), self.get_angle())
-            if round(self.spin_queue) != 0:
-                self.angle += sign(self.spin_queue) * pi / 2 / self.spin_speed
-                self.spin_queue -= sign(self.spin_queue)
-            else:
-                self.angle, self.spin_queue = pi / 4, 0.0
+        update_enemies(self.maze, [self])
 
     def hit(self, wound):
         """Handle the enemy when it's attacked."""
@@ -298,11 +294,12 @@ class Enemy:
     def die(self):
         """Handle the enemy's death."""
         if self.awake:
-            self.maze.map[self.x][self.y] = EMPTY
+            self.maze.unindex_enemy(self)
+            self.maze.map[self.x, self.y] = EMPTY
             if self.maze.enemy_weights[self.color] > MINW + 1.5:
                 self.maze.enemy_weights[self.color] -= 1.5
         else:
-            self.maze.map[self.x][self.y] = WALL
+            self.maze.map[self.x, self.y] = WALL
 
 
 class Chameleon(Enemy):
@@ -311,6 +308,8 @@ class Chameleon(Enemy):
     Additional attributes:
         visible (float): time until the Chameleon is visible (in ms)
     """
+    hiding = True
+
     def __init__(self, maze, x, y):
         Enemy.__init__(self, maze, x, y, 'Chameleon')
         self.visible = 0.0
@@ -320,15 +319,16 @@ class Chameleon(Enemy):
         if Enemy.wake(self) is True:
             self.visible = 1000.0 / ENEMY_SPEED
 
-    def draw(self):
+    def is_visible(self):
+        """Return whether the Chameleon can be seen, which is always
+        the case while the hero cannot move.
+        """
+        return self.visible > 0 or self.maze.next_move > 0
+
+    def draw(self, surface, sprites, dx=0.0, dy=0.0):
         """Draw the Chameleon."""
         if not self.awake or self.visible > 0 or self.spin_queue:
-            Enemy.draw(self)
-
-    def update(self):
-        """Update the Chameleon."""
-        Enemy.update(self)
-        if self.awake: self.visible -= 1000.0 / self.maze.fps
+            Enemy.draw(self, surface, sprites, dx, dy)
 
     def hit(self, wound):
         """Handle the Chameleon when it's attacked."""
@@ -350,31 +350,82 @@ class Plum(Enemy):
         other.awake, other.next_strike = True, self.next_strike
         other.offsetx, other.offsety = self.offsetx, self.offsety
         other.spin_queue, other.wound = self.spin_queue, self.wound
+        self.maze.index_enemy(other)
         return True
 
 
 class ScarletRed(Enemy):
-    """Object representing an enemy of Scarlet Red."""
+    """Object representing an enemy of Scarlet Red, which moves faster
+    but doesn't shoot.
+    """
+    speed, ranged = ENEMY_SPEED * SQRT2, False
+
     def __init__(self, maze, x, y):
         Enemy.__init__(self, maze, x, y, 'ScarletRed')
 
-    def fire(self):
-        """Scarlet Red doesn't shoot."""
-        return False
-
-    def move(self):
-        return Enemy.move(self, ENEMY_SPEED * SQRT2)
-
     def slash(self):
         """Handle the Scarlet Red's close-range attack."""
         self.wound -= Enemy.slash(self)
         if self.wound < 0: self.wound = 0.0
 
 
-def new_enemy(maze, x, y):
-    """Return an enemy of a random type in the grid (x, y)."""
-    color = choices(maze.enemy_weights)
+def new_enemy(maze, x, y, color=None):
+    """Return an enemy of the given color, or a random one if it is
+    None, in the grid (x, y).
+    """
+    if color is None: color = choices(maze.enemy_weights, maze.rng)
     try:
         return getattr(modules[__name__], color)(maze, x, y)
     except AttributeError:
         return Enemy(maze, x, y, color)
+
+
+def update_enemies(maze, enemies):
+    """Update the awake ones among the given enemies of the maze,
+    in the given order.
+
+    This is done in one pass, with everything shared by the enemies
+    computed only once and behaviours of types of enemies given by
+    their class attributes instead of overridden methods.  Only idle
+    enemies, i.e. neither moving between grids nor spinning, compute
+    their positions, since the others can neither fire nor start
+    moving or spinning.
+    """
+    hero, rng, fps = maze.hero, maze.rng, maze.fps
+    speed, period, reach = fps / ENEMY_HP, 1000.0 / fps, FIRANGE*maze.distance
+    turn = pi / 2 / speed   # angle turned per frame of spinning
+    chance = (hero.slashing+maze.isfast()+1) * 3
+    for enemy in enemies:
+        if not enemy.awake: continue
+        spin_queue = enemy.spin_queue * (speed / enemy.spin_speed)
+        enemy.spin_speed = speed
+        next_strike = enemy.next_strike = enemy.next_strike - period
+        if enemy.hiding: enemy.visible -= period
+
+        # Move between grids, along x then y, or act if idle
+        if spin_queue:
+            pass
+        elif enemy.offsetx:
+            enemy.offsetx -= sign(enemy.offsetx)
+        elif enemy.offsety:
+            enemy.offsety -= sign(enemy.offsety)
+        else:
+            x, y = maze.get_pos(enemy.x, enemy.y)
+            if (enemy.ranged and not hero.dead and next_strike <= 0
+                and (enemy.x, enemy.y) not in AROUND_HERO
+                and maze.get_distance(x, y) <= reach
+                and not rng.randrange(chance)):
+                enemy.next_strike = ATTACK_SPEED
+                angle = atan2(y - maze.y, x - maze.x)
+                maze.bullets.append(x, y, angle + pi, enemy.color)
+            elif next_strike > 0 or not enemy.move():
+                spin_queue = randsign(rng) * speed
+                if not hero.dead:
+                    maze.play(enemy.sfx_slash, enemy.get_slash(),
+                              enemy.get_angle())
+
+        if round(spin_queue) != 0:
+            enemy.angle += sign(spin_queue) * turn
+            enemy.spin_queue = spin_queue - sign(spin_queue)
+        else:
+            enemy.angle, enemy.spin_queue = pi / 4, 0.0
@@ -0,0 +1,365 @@
+# -*- coding: utf-8 -*-
+# connection.py - module for framed I/O with remote clients
+# Copyright (C) 2017, 2018  Nguyễn Gia Phong
+#
+# This file is part of Brutal Maze.
+#
+# Brutal Maze is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# Brutal Maze is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with Brutal Maze.  If not, see <https://www.gnu.org/licenses/>.
+
+__doc__ = 'Brutal Maze module for framed I/O with remote clients'
+
+from selectors import DefaultSelector, EVENT_READ, EVENT_WRITE
+from socket import AF_INET, AF_INET6, IPPROTO_TCP, TCP_NODELAY
+from struct import Struct
+from time import monotonic, sleep
+
+from .protocol import PROTOCOLS
+
+# Commands are either three integers (move, angle and attack) or names of
+# protocols, optionally ended by a newline.  Since attack has one digit,
+# a command is known to be complete once it has three fields, so clients
+# are not required to send the newline.  Unfinished ones are never longer
+# than COMMAND_SIZE bytes.
+COMMAND_SIZE = 7
+
+# Shared memory blocks start with the number of times clients attached or
+# detached (odd when one is attached), that number as of the last accepted
+# client, the number of commands sent, the latest command, the number of
+# frames sent to the accepted client and the length of the latest frame,
+# followed by its data.  Counters are written separately after what they
+# count, so a reader polling a counter sees complete data once it changes.
+SHARED_SIZE = 1 << 20   # bytes
+SPIN = 0.001    # seconds of busy waiting before sleeping between polls
+COUNTER = Struct('!I')      # also used for the frame length
+COMMAND = Struct('!B15s')   # length, command
+ATTACHES, ACCEPTED, COMMANDS, LAST_COMMAND = 0, 4, 8, 12
+FRAMES, LENGTH, DATA = 28, 32, 36
+
+
+def is_complete(command):
+    """Return whether the command without its newline is complete."""
+    fields = command.split()
+    return len(fields) == 3 or len(fields) == 1 and fields[0] in PROTOCOLS
+
+
+def poll(ready, timeout=None):
+    """Wait at most timeout seconds (forever if it is None) until
+    ready returns True and return whether it does.
+    """
+    start = monotonic()
+    while not ready():
+        now = monotonic()
+        if timeout is not None and now - start >= timeout: return False
+        # Only spin for a short while, so that idle servers sleep
+        sleep(0 if now - start < SPIN else SPIN)
+    return True
+
+
+class Server:
+    """Object accepting clients of a listening socket without blocking.
+
+    Attributes:
+        socket (socket): the listening socket, in non-blocking mode
+        selector (DefaultSelector): selector watching the socket
+    """
+    def __init__(self, socket):
+        self.socket = socket
+        self.socket.setblocking(False)
+        self.selector = DefaultSelector()
+        self.selector.register(socket, EVENT_READ)
+
+    def accept(self, timeout=None):
+        """Wait at most timeout seconds (forever if it is None) for
+        a client and return its Connection, or None if there is none.
+        """
+        if not self.selector.select(timeout): return None
+        try:
+            return Connection(*self.socket.accept())
+        except (BlockingIOError, InterruptedError):     # taken by others
+            return None
+
+    def close(self):
+        """Stop listening."""
+        self.selector.close()
+        self.socket.close()
+
+
+class Connection:
+    """Object sending frames to and receiving commands from a client
+    without blocking.
+
+    Frames are sent as their lengths in 7 digits followed by their data.
+
+    Attributes:
+        socket (socket): the client socket, in non-blocking mode
+        address (tuple): address of the client
+        name (str): address of the client for humans to read
+        selector (DefaultSelector): selector watching the socket
+        inbuf (bytes): received bytes of the unfinished command
+        outbuf (bytearray): bytes waiting to be sent
+    """
+    def __init__(self, socket, address):
+        self.socket, self.address = socket, address
+        self.socket.setblocking(False)
+        # Frames are sent whole, so there is nothing for Nagle to batch
+        if socket.family in (AF_INET, AF_INET6):
+            self.socket.setsockopt(IPPROTO_TCP, TCP_NODELAY, 1)
+            self.name = '{}:{}'.format(*address)
+        else:   # Unix domain socket
+            self.name = socket.getsockname()
+        self.selector = DefaultSelector()
+        self.selector.register(socket, EVENT_READ)
+        self.inbuf, self.outbuf = b'', bytearray()
+
+    def send(self, data):
+        """Queue the frame of the given data and send as much of it
+        as possible.
+        """
+        self.outbuf += '{:07}'.format(len(data)).encode()
+        self.outbuf += data
+        self.flush()
+
+    def flush(self):
+        """Send as much of the queued bytes as possible."""
+        if not self.outbuf: return
+        try:
+            sent = self.socket.send(self.outbuf)
+        except (BlockingIOError, InterruptedError):
+            return
+        del self.outbuf[:sent]
+
+    def read(self):
+        """Read all bytes available and return the complete commands
+        among them.
+
+        Raise EOFError if the client is closed, ValueError if an
+        invalid command is received.
+        """
+        chunks = [self.inbuf]
+        while True:
+            try:
+                chunk = self.socket.recv(4096)
+            except (BlockingIOError, InterruptedError):
+                break
+            if not chunk: raise EOFError('client is closed')
+            chunks.append(chunk)
+        lines = b''.join(chunks).decode().split('\n')
+        rest = lines.pop()
+        if is_complete(rest):
+            lines.append(rest)
+            rest = ''
+        elif len(rest) > COMMAND_SIZE:
+            raise ValueError('invalid command: {!r}'.format(rest))
+        self.inbuf = rest.encode()
+        return [line.strip() for line in lines if line.strip()]
+
+    def receive(self, timeout=None):
+        """Wait at most timeout seconds (forever if it is None) for
+        commands, while sending queued bytes, and return the list of
+        the complete ones received, which may be empty.
+
+        Raise EOFError if the client is closed, ValueError if an
+        invalid command is received.
+        """
+        deadline = None if timeout is None else monotonic() + timeout
+        while True:
+            self.flush()
+            events = EVENT_READ | EVENT_WRITE if self.outbuf else EVENT_READ
+            self.selector.modify(self.socket, events)
+            remain = None if deadline is None else deadline - monotonic()
+            ready = self.selector.select(
+                None if remain is None else max(remain, 0))
+            if any(mask & EVENT_READ for _, mask in ready):
+                commands = self.read()
+                if commands: return commands
+            if remain is not None and remain <= 0: return []
+
+    def close(self):
+        """Send what is left within a second and close the connection."""
+        deadline = monotonic() + 1
+        while self.outbuf and monotonic() < deadline:
+            self.selector.modify(self.socket, EVENT_WRITE)
+            self.selector.select(deadline - monotonic())
+            try:
+                self.flush()
+            except OSError:
+                break
+        self.selector.close()
+        self.socket.close()
+
+
+def attach(name):
+    """Return the existing block of shared memory of the given name."""
+    from multiprocessing.shared_memory import SharedMemory
+    try:
+        return SharedMemory(name, track=False)
+    except TypeError:   # before Python 3.13
+        memory = SharedMemory(name)
+        # Otherwise the block would be unlinked when the client exits
+        from multiprocessing.resource_tracker import unregister
+        unregister(memory._name, 'shared_memory')
+        return memory
+
+
+class SharedMemoryServer:
+    """Object serving clients one at a time through a block of shared
+    memory, which is created by the server.
+
+    Attributes:
+        memory (SharedMemory): the block of shared memory
+        attaches (int): number of attaches and detaches seen
+    """
+    def __init__(self, name, size=SHARED_SIZE):
+        from multiprocessing.shared_memory import SharedMemory
+        try:
+            self.memory = SharedMemory(name, create=True, size=size)
+        except FileExistsError:     # left by the last server
+            SharedMemory(name).unlink()
+            self.memory = SharedMemory(name, create=True, size=size)
+        self.memory.buf[:DATA] = bytes(DATA)
+        self.attaches = 0
+        print('Shared memory server is serving on {}'.format(name))
+
+    def accept(self, timeout=None):
+        """Wait at most timeout seconds (forever if it is None) for
+        a client and return its SharedMemoryConnection, or None if there
+        is none.
+        """
+        buf = self.memory.buf
+        def attached():
+            attaches = COUNTER.unpack_from(buf, ATTACHES)[0]
+            return attaches % 2 and attaches != self.attaches
+        if not poll(attached, timeout): return None
+        self.attaches = COUNTER.unpack_from(buf, ATTACHES)[0]
+        return SharedMemoryConnection(self.memory, self.attaches)
+
+    def close(self):
+        """Stop serving and remove the block of shared memory."""
+        self.memory.close()
+        self.memory.unlink()
+
+
+class SharedMemoryConnection:
+    """Object sending frames to and receiving commands from a client
+    through shared memory.
+
+    Only the latest command is kept in the memory, so commands are
+    coalesced when the client sends faster than they are received.
+
+    Attributes:
+        memory (SharedMemory): the block of shared memory
+        attaches (int): number of attaches and detaches when the client
+            attached
+        commands (int): number of commands received
+        frames (int): number of frames sent
+        length (int): length of the last frame sent
+    """
+    name = 'shared memory'
+
+    def __init__(self, memory, attaches):
+        self.memory, self.attaches = memory, attaches
+        self.commands = COUNTER.unpack_from(memory.buf, COMMANDS)[0]
+        # The client only starts counting frames once it is accepted
+        self.frames = self.length = 0
+        COUNTER.pack_into(memory.buf, FRAMES, self.frames)
+        COUNTER.pack_into(memory.buf, ACCEPTED, attaches)
+
+    def send(self, data):
+        """Write the frame of the given data to the memory."""
+        buf, stop = self.memory.buf, DATA + len(data)
+        if stop > len(buf): raise ValueError('frame is too large')
+        buf[DATA:stop] = data
+        self.frames, self.length = (self.frames+1) & 0xffffffff, len(data)
+        COUNTER.pack_into(buf, LENGTH, self.length)
+        COUNTER.pack_into(buf, FRAMES, self.frames)
+
+    def receive(self, timeout=None):
+        """Wait at most timeout seconds (forever if it is None) for
+        a command and return the list of the latest one, or an empty
+        list if there is none.
+
+        Raise EOFError if the client has detached.
+        """
+        buf = self.memory.buf
+        def ready():
+            return (COUNTER.unpack_from(buf, COMMANDS)[0] != self.commands
+                    or COUNTER.unpack_from(buf, ATTACHES)[0] != self.attaches)
+        if not poll(ready, timeout): return []
+        if COUNTER.unpack_from(buf, ATTACHES)[0] != self.attaches:
+            raise EOFError('client is detached')
+        self.commands = COUNTER.unpack_from(buf, COMMANDS)[0]
+        length, command = COMMAND.unpack_from(buf, LAST_COMMAND)
+        return [command[:length].decode().strip()]
+
+    def close(self):
+        """Tell the client that the game is over, if it has not been
+        told yet and is still attached.
+        """
+        attaches = COUNTER.unpack_from(self.memory.buf, ATTACHES)[0]
+        if self.length and attaches == self.attaches: self.send(b'')
+
+
+class SharedMemoryClient:
+    """Object receiving frames from and sending commands to a server
+    through shared memory.
+
+    Attaching waits at most timeout seconds (forever if it is None)
+    for the server to accept the client, otherwise TimeoutError
+    is raised.
+
+    Attributes:
+        memory (SharedMemory): the block of shared memory
+        frames (int): number of frames received
+    """
+    def __init__(self, name, timeout=None):
+        self.memory = attach(name)
+        buf = self.memory.buf
+        # Stay odd, but differ even if the last client has not detached
+        attaches = COUNTER.unpack_from(buf, ATTACHES)[0]
+        attaches += 1 + attaches%2
+        COUNTER.pack_into(buf, ATTACHES, attaches)
+        # Frames written before the server accepts are for the last client
+        if not poll(lambda: COUNTER.unpack_from(buf, ACCEPTED)[0]
+                    == attaches, timeout):
+            self.close()
+            raise TimeoutError('server did not accept the client')
+        self.frames = 0
+
+    def receive(self, timeout=None):
+        """Wait at most timeout seconds (forever if it is None) for
+        a frame and return its data, which is empty when the game is
+        over, or None if there is none.
+        """
+        buf = self.memory.buf
+        if not poll(lambda: COUNTER.unpack_from(buf, FRAMES)[0]
+                    != self.frames, timeout):
+            return None
+        self.frames = COUNTER.unpack_from(buf, FRAMES)[0]
+        length = COUNTER.unpack_from(buf, LENGTH)[0]
+        return bytes(buf[DATA:DATA+length])
+
+    def send(self, command):
+        """Send the command, as a string or bytes, to the server."""
+        if not isinstance(command, bytes): command = command.encode()
+        buf = self.memory.buf
+        COMMAND.pack_into(buf, LAST_COMMAND, len(command), command)
+        commands = COUNTER.unpack_from(buf, COMMANDS)[0]
+        COUNTER.pack_into(buf, COMMANDS, (commands+1) & 0xffffffff)
+
+    def close(self):
+        """Detach from the server."""
+        buf = self.memory.buf
+        attaches = COUNTER.unpack_from(buf, ATTACHES)[0]
+        if attaches % 2: COUNTER.pack_into(buf, ATTACHES, attaches + 1)
+        self.memory.close()
@@ -19,27 +19,24 @@
 
 __doc__ = 'Brutal Maze module for shared constants'
 
+from os.path import dirname, join
 from string import ascii_lowercase
 
-from pkg_resources import resource_filename as pkg_file
-import pygame
-from pygame.mixer import Sound
+# Only paths of data files are kept here, so that the game logic can be
+# imported without Pygame, which loads them in the rendering and sound layer.
+PKG_DIR = dirname(__file__)
+SETTINGS = join(PKG_DIR, 'settings.ini')
+ICON = join(PKG_DIR, 'icon.png')
+MUSIC = join(PKG_DIR, 'soundfx', 'music.ogg')
 
-SETTINGS = pkg_file('brutalmaze', 'settings.ini')
-ICON = pygame.image.load(pkg_file('brutalmaze', 'icon.png'))
-MUSIC = pkg_file('brutalmaze', 'soundfx/music.ogg')
-
-mixer = pygame.mixer.get_init()
-if mixer is None: pygame.mixer.init(frequency=44100)
-SFX_SPAWN = Sound(pkg_file('brutalmaze', 'soundfx/spawn.ogg'))
-SFX_SLASH_ENEMY = Sound(pkg_file('brutalmaze', 'soundfx/slash-enemy.ogg'))
-SFX_SLASH_HERO = Sound(pkg_file('brutalmaze', 'soundfx/slash-hero.ogg'))
-SFX_SHOT_ENEMY = Sound(pkg_file('brutalmaze', 'soundfx/shot-enemy.ogg'))
-SFX_SHOT_HERO = Sound(pkg_file('brutalmaze', 'soundfx/shot-hero.ogg'))
-SFX_MISSED = Sound(pkg_file('brutalmaze', 'soundfx/missed.ogg'))
-SFX_HEART = Sound(pkg_file('brutalmaze', 'soundfx/heart.ogg'))
-SFX_LOSE = Sound(pkg_file('brutalmaze', 'soundfx/lose.ogg'))
-if mixer is None: pygame.mixer.quit()
+SFX_SPAWN = join(PKG_DIR, 'soundfx', 'spawn.ogg')
+SFX_SLASH_ENEMY = join(PKG_DIR, 'soundfx', 'slash-enemy.ogg')
+SFX_SLASH_HERO = join(PKG_DIR, 'soundfx', 'slash-hero.ogg')
+SFX_SHOT_ENEMY = join(PKG_DIR, 'soundfx', 'shot-enemy.ogg')
+SFX_SHOT_HERO = join(PKG_DIR, 'soundfx', 'shot-hero.ogg')
+SFX_MISSED = join(PKG_DIR, 'soundfx', 'missed.ogg')
+SFX_HEART = join(PKG_DIR, 'soundfx', 'heart.ogg')
+SFX_LOSE = join(PKG_DIR, 'soundfx', 'lose.ogg')
 
 SQRT2 = 2 ** 0.5
 INIT_SCORE = 5**0.5/2 + 0.5     # golden mean
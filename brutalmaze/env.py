@@ -0,0 +1,154 @@
+# -*- coding: utf-8 -*-
+# env.py - module for running games in process
+# Copyright (C) 2017, 2018  Nguyễn Gia Phong
+#
+# This file is part of Brutal Maze.
+#
+# Brutal Maze is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# Brutal Maze is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with Brutal Maze.  If not, see <https://www.gnu.org/licenses/>.
+
+__doc__ = 'Brutal Maze module for running games in process'
+
+from math import radians
+
+import numpy as np
+
+from .constants import ENEMIES, BULLET_LIFETIME
+from .maze import Maze
+
+
+class Environment:
+    """Object running a game without graphics or sound, which is
+    advanced by exactly one frame per step.
+
+    Steps take the same input as commands of remote control: move is
+    the direction from 0 to 8 (4 to stay still), angle is in degrees
+    and attack is 0 for none, 1 for long-range and 2 for close-range.
+
+    Observations are dicts of NumPy arrays, whose coordinates are
+    relative to the hero and measured in grids:
+        walls: grids on display by rows, 1 for walls and sleeping
+            enemies, all 0 when the hero is frozen
+        hero: wound, angle, whether he can attack and whether he can heal
+        enemies: type (index in ENEMIES), wound, x, y and angle
+            of each visible awake enemy
+        bullets: type (index in BULLET_COLORS), fraction of its
+            lifetime passed, x, y and angle of each bullet
+        planes: observation planes from Maze.get_planes, which are
+            overwritten by the next step
+
+    Attributes:
+        fps (float): frame rate the game is simulated at
+        maze (Maze): the maze
+    """
+    def __init__(self, size=(640, 480), fps=60.0, seed=None):
+        self.fps = float(fps)
+        self.maze = Maze(self.fps, size, seed)
+
+    def reset(self, seed=None):
+        """Start a new game with the given seed, or a random one if it
+        is None, and return the first observation.
+        """
+        self.maze.reinit(seed)
+        return self.observation()
+
+    def snapshot(self):
+        """Return the state of the game as bytes, which can be passed
+        to restore of this or another environment, even in another
+        process, to try different inputs from the same state.
+        """
+        return self.maze.snapshot()
+
+    def restore(self, snapshot):
+        """Restore the game to the given snapshot and return the
+        observation.
+        """
+        self.maze.restore(snapshot)
+        return self.observation()
+
+    def step(self, move, angle, attack):
+        """Advance the game by one frame with the given input.
+
+        Return the observation, the score gained in the frame, whether
+        the hero is dead and a dict containing the current score.
+        """
+        maze, score = self.maze, self.maze.score
+        y, x = (i - 1 for i in divmod(move, 3))
+        maze.move(x, y, self.fps)
+        maze.hero.update_angle(radians(angle))
+        maze.hero.firing, maze.hero.slashing = attack & 1, attack >> 1
+        maze.update(self.fps)
+        return (self.observation(), maze.score - score, maze.hero.dead,
+                {'score': maze.get_score()})
+
+    def observation(self):
+        """Return the current observation."""
+        maze, hero = self.maze, self.maze.hero
+        planes, enemies = maze.get_planes(), []
+        for enemy in maze.enemies:
+            if not enemy.awake or not enemy.is_visible(): continue
+            x, y = enemy.get_pos()
+            enemies.append((ENEMIES.index(enemy.color), enemy.wound,
+                            (x-maze.x) / maze.distance,
+                            (y-maze.y) / maze.distance, enemy.angle))
+
+        bullets = maze.bullets
+        return {'walls': planes[0].astype(np.uint8),
+                'hero': np.array([hero.wound, hero.angle,
+                                  hero.next_strike <= 0, hero.next_heal <= 0],
+                                 float),
+                'enemies': np.array(enemies, float).reshape(-1, 5),
+                'bullets': np.column_stack((
+                    bullets.color, 1 - bullets.fall_time/BULLET_LIFETIME,
+                    (bullets.x-maze.x) / maze.distance,
+                    (bullets.y-maze.y) / maze.distance, bullets.angle)),
+                'planes': planes}
+
+
+class VectorEnvironment:
+    """Object stepping a number of environments at once.
+
+    A game which is over is started again right away with a seed drawn
+    from its own random generator, so the environments stay in step.
+
+    Attributes:
+        envs (list of Environment): the environments
+    """
+    def __init__(self, n, size=(640, 480), fps=60.0, seed=None):
+        self.envs = [Environment(size, fps, None if seed is None else seed+i)
+                     for i in range(n)]
+
+    def __len__(self): return len(self.envs)
+
+    def reset(self, seed=None):
+        """Start new games, seeded with consecutive numbers from the
+        given seed if it is not None, and return their observations.
+        """
+        return [env.reset(None if seed is None else seed + i)
+                for i, env in enumerate(self.envs)]
+
+    def step(self, moves, angles, attacks):
+        """Advance every game by one frame with the corresponding input.
+
+        Return the list of observations, the array of score gained,
+        the array of whether each game is over and the list of infos.
+        """
+        observations, infos = [], []
+        rewards, dones = np.zeros(len(self)), np.zeros(len(self), bool)
+        for i, env in enumerate(self.envs):
+            observation, rewards[i], dones[i], info = env.step(
+                moves[i], angles[i], attacks[i])
+            if dones[i]: observation = env.reset(env.maze.rng.getrandbits(32))
+            observations.append(observation)
+            infos.append(info)
+        return observations, rewards, dones, infos
@@ -19,27 +19,40 @@
 
 __version__ = '0.6.4'
 
+import json
 import re
 from argparse import ArgumentParser, FileType, RawTextHelpFormatter
-from collections import deque
-try:                    # Python 3
-    from configparser import ConfigParser
-except ImportError:     # Python 2
-    from ConfigParser import ConfigParser
+from configparser import ConfigParser
+from http.server import BaseHTTPRequestHandler, HTTPServer
 from math import atan2, radians, pi
+from multiprocessing import Process
+from os import remove, stat
 from os.path import join, pathsep
-from socket import socket, SOL_SOCKET, SO_REUSEADDR
+from socket import socket, AF_UNIX, SOL_SOCKET, SO_REUSEADDR
+from stat import S_ISSOCK
+from struct import error as StructError
 from sys import stdout
 from threading import Thread
+from time import perf_counter
 
 import pygame
 from pygame import KEYDOWN, QUIT, VIDEORESIZE
 from pygame.time import Clock, get_ticks
 from appdirs import AppDirs
 
-from .constants import SETTINGS, ICON, MUSIC, HERO_SPEED, COLORS, WALL
+from .connection import Server, SharedMemoryServer
+from .constants import SETTINGS, ICON, MUSIC
+from .graphics import Canvas
 from .maze import Maze
-from .misc import deg, round2, sign
+from .protocol import PROTOCOLS, export_text
+from .replay import Recorder
+from .sound import Mixer
+
+# Most steps simulated per frame drawn, after which the game slows down
+# instead of spending ever longer catching up with the wall clock
+MAX_STEPS = 5
+# Longest time waiting for clients without checking for QUIT events (in s)
+POLL = 0.1
 
 
 class ConfigReader:
@@ -47,7 +60,7 @@ class ConfigReader:
     Brutal Maze.
     """
     CONTROL_ALIASES = (('New game', 'new'), ('Toggle pause', 'pause'),
-                       ('Toggle mute', 'mute'),
+                       ('Toggle mute', 'mute'), ('Toggle stats', 'stats'),
                        ('Move left', 'left'), ('Move right', 'right'),
                        ('Move up', 'up'), ('Move down', 'down'),
                        ('Long-range attack', 'shot'),
@@ -60,8 +73,11 @@ class ConfigReader:
         self.config.read(SETTINGS)  # default configuration
         self.config.read(filenames)
 
-    # Fallback to None when attribute is missing
-    def __getattr__(self, name): return None
+    # Fallback to None when attribute is missing, except for special ones
+    # which are looked up by pickle when passing config to other processes
+    def __getattr__(self, name):
+        if name.startswith('__'): raise AttributeError(name)
+        return None
 
     def parse(self):
         """Parse configurations."""
@@ -73,8 +89,17 @@ class ConfigReader:
         self.server = self.config.getboolean('Server', 'Enable')
         self.host = self.config.get('Server', 'Host')
         self.port = self.config.getint('Server', 'Port')
+        self.socket = self.config.get('Server', 'Socket') or None
+        self.shared_memory = (self.config.get('Server', 'Shared memory')
+                              or None)
         self.timeout = self.config.getfloat('Server', 'Timeout')
         self.headless = self.config.getboolean('Server', 'Headless')
+        self.lockstep = self.config.getboolean('Server', 'Lockstep')
+        self.sessions = self.config.getint('Server', 'Sessions')
+        seed = self.config.get('Server', 'Seed')
+        self.seed = int(seed) if seed else None
+        port = self.config.get('Server', 'Stats port')
+        self.stats_port = int(port) if port else None
 
         if self.server: return
         self.key, self.mouse = {}, {}
@@ -96,91 +121,117 @@ class ConfigReader:
     def read_args(self, arguments):
         """Read and parse a ArgumentParser.Namespace."""
         for option in ('size', 'max_fps', 'muted', 'musicvol',
-                       'server', 'host', 'port', 'timeout', 'headless'):
+                       'server', 'host', 'port', 'socket', 'shared_memory',
+                       'timeout', 'headless',
+                       'lockstep', 'sessions', 'seed', 'record', 'stats_port'):
             value = getattr(arguments, option)
             if value is not None: setattr(self, option, value)
 
 
+def listen(config):
+    """Return a socket server listening on the configured address,
+    which is the Unix domain socket path if there is one.
+    """
+    if config.socket is None:
+        server = socket()
+        server.setsockopt(SOL_SOCKET, SO_REUSEADDR, 1)
+        server.bind((config.host, config.port))
+        address = '{}:{}'.format(config.host, config.port)
+    else:
+        try:    # remove the socket left by the last server
+            if S_ISSOCK(stat(config.socket).st_mode): remove(config.socket)
+        except OSError:
+            pass
+        server = socket(AF_UNIX)
+        server.bind(config.socket)
+        address = config.socket
+    server.listen(config.sessions)
+    print('Socket server is listening on {}'.format(address))
+    return server
+
+
+class StatsHandler(BaseHTTPRequestHandler):
+    """Handler of requests for statistics, served as JSON."""
+    def do_GET(self):
+        data = json.dumps(self.server.stats.export(), sort_keys=True)
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', len(data))
+        self.end_headers()
+        self.wfile.write(data.encode())
+
+    def log_message(self, format, *args):
+        """Do not log requests."""
+
+
+def serve(stats, port, host='localhost'):
+    """Serve the statistics over HTTP at the given address in a daemon
+    thread and return the HTTP server.
+    """
+    server = HTTPServer((host, port), StatsHandler)
+    server.stats = stats
+    thread = Thread(target=server.serve_forever)
+    thread.daemon = True
+    thread.start()
+    print('Statistics are served on http://{}:{}'.format(host, port))
+    return server
+
+
 class Game:
-    """Object handling main loop and IO."""
-    def __init__(self, config):
+    """Object handling main loop and IO.
+
+    The game is simulated in steps of a fixed 1/fps second, taken as
+    many times as the wall clock has advanced since the last frame, and
+    drawn once per frame between the last two steps, so that drawing
+    can drop frames under load without changing the outcome.
+    """
+    def __init__(self, config, server=None):
         pygame.mixer.pre_init(frequency=44100)
         pygame.init()
         self.headless = config.headless and config.server
+        self.lockstep = config.lockstep and config.server
         if config.muted or self.headless:
             pygame.mixer.quit()
         else:
             pygame.mixer.music.load(MUSIC)
             pygame.mixer.music.set_volume(config.musicvol)
             pygame.mixer.music.play(-1)
-        pygame.display.set_icon(ICON)
+        pygame.display.set_icon(pygame.image.load(ICON))
 
         pygame.fastevent.init()
         if config.server:
-            self.server = socket()
-            self.server.setsockopt(SOL_SOCKET, SO_REUSEADDR, 1)
-            self.server.bind((config.host, config.port))
-            self.server.listen(1)
-            print('Socket server is listening on {}:{}'.format(config.host,
-                                                               config.port))
-            self.timeout = config.timeout
+            if config.shared_memory is not None:
+                self.server = SharedMemoryServer(config.shared_memory)
+            else:
+                self.server = Server(listen(config) if server is None
+                                     else server)
+            self.timeout, self.connection = config.timeout, None
             self.sockinp = 0, 0, -pi * 3 / 4, 0, 0  # freeze and point to NW
         else:
             self.server = self.sockinp = None
 
-        # self.fps is a float to make sure floordiv won't be used in Python 2
-        self.max_fps, self.fps = config.max_fps, float(config.max_fps)
+        self.fps, self.input = float(config.max_fps), None
+        # Wall clock time not yet simulated, in seconds
+        self.accumulator, self.last = 0.0, perf_counter()
         self.musicvol = config.musicvol
         self.key, self.mouse = config.key, config.mouse
-        self.maze = Maze(config.max_fps, config.size, config.headless)
-        self.hero = self.maze.hero
+        self.seed = config.seed
+        self.maze = Maze(config.max_fps, config.size, self.seed)
+        self.canvas = None if self.headless else Canvas(self.maze)
+        self.hero, self.stats = self.maze.hero, self.maze.stats
+        self.stats_server = (None if config.stats_port is None
+                             else serve(self.stats, config.stats_port))
+        self.mixer = Mixer()
+        if config.record is None:
+            self.recorder = None
+        else:
+            self.recorder = Recorder(open(config.record, 'wb'))
+            # Servers only record games of their clients
+            if not self.server: self.recorder.new_game(self.maze)
         self.clock, self.paused = Clock(), False
 
     def __enter__(self): return self
 
-    def expos(self, x, y):
-        """Return position of the given coordinates in rounded percent."""
-        cx = (x+self.maze.x-self.maze.centerx) / self.maze.distance * 100
-        cy = (y+self.maze.y-self.maze.centery) / self.maze.distance * 100
-        return round2(cx), round2(cy)
-
-    def export(self):
-        """Export maze data to a bytes object."""
-        maze, hero, = self.maze, self.hero
-        lines = deque(['{0} {4} {5} {1} {2:d} {3:d}'.format(
-            COLORS[hero.get_color()], deg(self.hero.angle),
-            hero.next_strike <= 0, hero.next_heal <= 0,
-            *self.expos(maze.x, maze.y))])
-
-        walls = [[1 if maze.map[x][y] == WALL else 0 for x in maze.rangex]
-                 for y in maze.rangey] if maze.next_move <= 0 else []
-        ne = nb = 0
-
-        for enemy in maze.enemies:
-            if not enemy.awake and walls:
-                walls[enemy.y-maze.rangey[0]][enemy.x-maze.rangex[0]] = WALL
-                continue
-            # Check Chameleons
-            elif getattr(enemy, 'visible', 1) <= 0 and maze.next_move <= 0:
-                continue
-            lines.append('{0} {2} {3} {1:.0f}'.format(
-                COLORS[enemy.get_color()], deg(enemy.angle),
-                *self.expos(*enemy.get_pos())))
-            ne += 1
-
-        for bullet in maze.bullets:
-            x, y = self.expos(bullet.x, bullet.y)
-            color, angle = COLORS[bullet.get_color()], deg(bullet.angle)
-            if color != '0':
-                lines.append('{} {} {} {:.0f}'.format(color, x, y, angle))
-                nb += 1
-
-        if walls: lines.appendleft('\n'.join(''.join(str(cell) for cell in row)
-                                             for row in walls))
-        lines.appendleft('{} {} {} {}'.format(len(walls), ne, nb,
-                                              maze.get_score()))
-        return '\n'.join(lines).encode()
-
     def update(self):
         """Draw and handle meta events on Pygame window.
 
@@ -190,11 +241,12 @@ class Game:
         for event in events:
             if event.type == QUIT:
                 return False
-            elif event.type == VIDEORESIZE:
-                self.maze.resize((event.w, event.h))
+            elif event.type == VIDEORESIZE and not self.headless:
+                self.canvas.resize((event.w, event.h))
+                if self.recorder: self.recorder.resize((event.w, event.h))
             elif event.type == KEYDOWN and not self.server:
                 if event.key == self.key['new']:
-                    self.maze.reinit()
+                    self.new_game()
                 elif event.key == self.key['pause'] and not self.hero.dead:
                     self.paused ^= True
                 elif event.key == self.key['mute']:
@@ -205,90 +257,191 @@ class Game:
                         pygame.mixer.music.play(-1)
                     else:
                         pygame.mixer.quit()
+                elif event.key == self.key['stats'] and not self.headless:
+                    self.canvas.overlay ^= True
 
-        # Compare current FPS with the average of the last 10 frames
-        new_fps = self.clock.get_fps()
-        if new_fps < self.fps:
-            self.fps -= 1
-        elif self.fps < self.max_fps and not self.paused:
-            self.fps += 5
-        if not self.paused: self.maze.update(self.fps)
-        if not self.headless: self.maze.draw()
-        self.clock.tick(self.fps)
+        if self.lockstep:
+            steps = 0 if self.paused else 1
+        else:
+            now = perf_counter()
+            if not self.paused: self.accumulator += now - self.last
+            self.last = now
+            steps = min(int(self.accumulator * self.fps), MAX_STEPS)
+            self.accumulator -= steps / self.fps
+            if steps == MAX_STEPS: self.accumulator %= 1 / self.fps
+            self.stats.set('clock fps', self.clock.get_fps())
+        # Play sound effects requested since the last frame, including
+        # those of every step, each of which starts with a new list of them
+        sounds = self.maze.sounds
+        for i in range(steps):
+            self.step()
+            sounds.extend(self.maze.sounds)
+        self.maze.sounds = []
+        for sound in sounds: self.mixer.play(*sound)
+        self.stats.set('fps', self.fps)
+        self.stats.set('steps', steps)
+        if not self.headless:
+            self.stats.start()
+            # Draw the maze between the last two steps, as far from
+            # the previous one as the time not yet simulated
+            self.canvas.draw(1.0 if self.lockstep
+                             else self.accumulator * self.fps)
+            self.stats.lap('draw')
+        if not self.lockstep: self.clock.tick(self.fps)
         return True
 
-    def move(self, x, y):
-        """Command the hero to move faster in the given direction."""
-        x, y = -x, -y # or move the maze in the reverse direction
-        velocity = self.maze.distance * HERO_SPEED / self.fps
-        accel = velocity * HERO_SPEED / self.fps
-
-        if self.maze.next_move > 0 or not x:
-            self.maze.vx -= sign(self.maze.vx) * accel
-            if abs(self.maze.vx) < accel * 2: self.maze.vx = 0.0
-        elif x * self.maze.vx < 0:
-            self.maze.vx += x * 2 * accel
-        else:
-            self.maze.vx += x * accel
-            if abs(self.maze.vx) > velocity: self.maze.vx = x * velocity
-
-        if self.maze.next_move > 0 or not y:
-            self.maze.vy -= sign(self.maze.vy) * accel
-            if abs(self.maze.vy) < accel * 2: self.maze.vy = 0.0
-        elif y * self.maze.vy < 0:
-            self.maze.vy += y * 2 * accel
-        else:
-            self.maze.vy += y * accel
-            if abs(self.maze.vy) > velocity: self.maze.vy = y * velocity
+    def step(self):
+        """Advance the game by one step of 1/fps second, with the last
+        control input if any.
+        """
+        recording = self.recorder and (not self.server or self.connection)
+        if self.input is not None:
+            x, y, angle, firing, slashing = self.input
+            if recording:
+                self.recorder.control(self.fps, x, y, angle, firing, slashing)
+            self.maze.move(x, y, self.fps)
+            self.hero.update_angle(angle)
+            self.hero.firing = firing
+            self.hero.slashing = slashing
+        if recording: self.recorder.update(self.fps)
+        self.maze.update(self.fps)
+
+    def new_game(self):
+        """Start a new game."""
+        self.maze.reinit(self.seed)
+        if self.recorder: self.recorder.new_game(self.maze)
 
     def control(self, x, y, angle, firing, slashing):
-        """Control how the hero move and attack."""
-        self.move(x, y)
-        self.hero.update_angle(angle)
-        self.hero.firing = firing
-        self.hero.slashing = slashing
+        """Control how the hero move and attack in the following steps."""
+        self.input = x, y, angle, firing, slashing
+
+    def connect(self, timeout=None):
+        """Wait at most timeout seconds (forever if it is None) for
+        a client of the socket server and start a new game for it.
+        """
+        self.connection = self.server.accept(timeout)
+        if self.connection is None: return
+        self.export, self.time = export_text, get_ticks()
+        print('[{}] Connected to {}'.format(self.time, self.connection.name))
+        self.new_game()
+        self.reply()
+
+    def disconnect(self):
+        """Close the connection to the client and end its game."""
+        self.sockinp = 0, 0, -pi * 3 / 4, 0, 0
+        time = get_ticks()
+        print('[{}] {} scored {} points in {}ms'.format(
+            time, self.connection.name, self.maze.get_score(),
+            time - self.time))
+        self.connection.close()
+        self.connection = None
+        if not self.hero.dead:
+            self.maze.lose()
+            if self.recorder: self.recorder.lose()
+        if self.recorder: self.recorder.flush()
+
+    def reply(self):
+        """Send maze data to the client, or end the connection with
+        an empty frame if the hero is dead.
+        """
+        if self.hero.dead:
+            self.connection.send(b'')
+            self.disconnect()
+        else:
+            self.stats.start()
+            try:
+                data = self.export(self.maze)
+            except (StructError, OverflowError, ValueError) as e:
+                print('[{}] Failed to export to {}: {}'.format(
+                    get_ticks(), self.connection.name, e))
+                return self.disconnect()
+            self.stats.lap('export')
+            self.stats.add('exported bytes', len(data))
+            self.connection.send(data)
+            self.deadline = get_ticks() + self.timeout*1000
+
+    def command(self, command):
+        """Handle the command from the client and return whether it
+        controls the hero.  Raise ValueError if it is invalid.
+        """
+        if command in PROTOCOLS:
+            self.export = PROTOCOLS[command]()
+            return False
+        move, angle, attack = map(int, command.split())
+        y, x = (i - 1 for i in divmod(move, 3))
+        self.sockinp = x, y, radians(angle), attack & 1, attack >> 1
+        return True
 
     def remote_control(self):
-        """Handle remote control though socket server.
+        """Handle remote control though socket server without blocking.
+
+        This function is supposed to be called once per frame.  Commands
+        received since the last frame are coalesced, i.e. only the latest
+        control is kept, and answered by one frame of maze data.
 
-        This function is supposed to be run in a Thread.
+        Maze data is exported in the text format, until the client
+        replies with the name of another one in PROTOCOLS instead of
+        a command.
+        """
+        if self.connection is None: return self.connect(0)
+        try:
+            commands = self.connection.receive(0)
+            for command in commands: self.command(command)
+        except (EOFError, ValueError, OSError):     # closed or invalid
+            return self.disconnect()
+        if commands:
+            self.reply()
+        elif get_ticks() > self.deadline:   # timed out
+            self.disconnect()
+
+    def lockstep_control(self):
+        """Handle remote control though socket server in lockstep mode,
+        in which each command is answered by one frame of maze data and
+        each control advances the game by exactly one frame.
+
+        Return when QUIT event is captured.  While waiting for clients
+        or their commands, it is checked every POLL seconds.
         """
-        clock = Clock()
         while True:
-            connection, address = self.server.accept()
-            connection.settimeout(self.timeout)
-            time = get_ticks()
-            print('[{}] Connected to {}:{}'.format(time, *address))
-            self.maze.reinit()
-            while True:
-                if self.hero.dead:
-                    connection.send('0000000'.encode())
-                    break
-                data = self.export()
-                connection.send('{:07}'.format(len(data)).encode())
-                connection.send(data)
-                try:
-                    buf = connection.recv(7)
-                except:     # client is closed or timed out
-                    break
-                if not buf: break
+            if self.connection is None:
+                if self.quitting(): return
+                self.connect(POLL)
+                continue
+            deadline = get_ticks() + self.timeout*1000
+            try:
+                commands = self.connection.receive(POLL)
+                while not commands:
+                    if self.quitting(): return
+                    remain = deadline - get_ticks()
+                    if remain <= 0: raise EOFError('client timed out')
+                    commands = self.connection.receive(min(POLL, remain/1000))
+            except (EOFError, ValueError, OSError):
+                self.disconnect()
+                continue
+            for command in commands:
                 try:
-                    move, angle, attack = map(int, buf.decode().split())
+                    control = self.command(command)
                 except ValueError:  # invalid input
+                    self.disconnect()
                     break
-                y, x = (i - 1 for i in divmod(move, 3))
-                self.sockinp = x, y, radians(angle), attack & 1, attack >> 1
-                clock.tick(self.fps)
-            self.sockinp = 0, 0, -pi * 3 / 4, 0, 0
-            new_time = get_ticks()
-            print('[{0}] {3}:{4} scored {1} points in {2}ms'.format(
-                new_time, self.maze.get_score(), new_time - time, *address))
-            connection.close()
-            if not self.hero.dead: self.maze.lose()
+                if control:
+                    self.control(*self.sockinp)
+                    if not self.update(): return self.disconnect()
+                self.reply()
+                if self.connection is None: break
+
+    def quitting(self):
+        """Return whether QUIT event is captured, leaving other events
+        to be handled by update.
+        """
+        pygame.event.pump()
+        return pygame.event.peek(QUIT)
 
     def user_control(self):
         """Handle direct control from user's mouse and keyboard."""
-        if not self.hero.dead:
+        if self.hero.dead:
+            self.input = None
+        else:
             keys = pygame.key.get_pressed()
             right = keys[self.key['right']] - keys[self.key['left']]
             down = keys[self.key['down']] - keys[self.key['up']]
@@ -310,10 +463,30 @@ class Game:
             self.control(right, down, angle, firing, slashing)
 
     def __exit__(self, exc_type, exc_value, traceback):
-        if self.server is not None: self.server.close()
+        if self.server is not None:
+            if self.connection is not None: self.disconnect()
+            self.server.close()
+        if self.recorder: self.recorder.close()
+        if self.stats_server: self.stats_server.shutdown()
         pygame.quit()
 
 
+def run(config, server=None):
+    """Run the game and its main loop until it is closed.
+
+    If server is given, use it instead of opening a new socket server.
+    """
+    with Game(config, server) as game:
+        if game.lockstep:
+            game.lockstep_control()
+        elif config.server:
+            while game.update():
+                game.remote_control()
+                game.control(*game.sockinp)
+        else:
+            while game.update(): game.user_control()
+
+
 def main():
     """Start game and main loop."""
     # Read configuration file
@@ -342,7 +515,7 @@ def main():
         help='the desired screen size (fallback: {}x{})'.format(*config.size))
     parser.add_argument(
         '-f', '--max-fps', type=int, metavar='FPS',
-        help='the desired maximum FPS (fallback: {})'.format(config.max_fps))
+        help='the simulated frame rate (fallback: {})'.format(config.max_fps))
     parser.add_argument(
         '--mute', '-m', action='store_true', default=None, dest='muted',
         help='mute all sounds (fallback: {})'.format(config.muted))
@@ -362,6 +535,14 @@ def main():
     parser.add_argument(
         '--port', type=int,
         help='port for server to listen on (fallback: {})'.format(config.port))
+    parser.add_argument(
+        '--socket', metavar='PATH',
+        help='Unix domain socket for server to listen on instead of host\n'
+        'and port (fallback: {})'.format(config.socket))
+    parser.add_argument(
+        '--shared-memory', metavar='NAME',
+        help='name of shared memory block to serve through instead of\n'
+        'sockets (fallback: {})'.format(config.shared_memory))
     parser.add_argument(
         '-t', '--timeout', type=float,
         help='socket operations timeout in seconds (fallback: {})'.format(
@@ -372,6 +553,29 @@ def main():
             not config.headless))
     parser.add_argument('--headless', action='store_true',
                         help='run server without graphics or sound')
+    parser.add_argument(
+        '--lockstep', action='store_true', default=None,
+        help='advance one frame per command (fallback: {})'.format(
+            config.lockstep))
+    parser.add_argument('--realtime', action='store_false', dest='lockstep',
+                        help='run server at the frame rate of the wall clock')
+    parser.add_argument(
+        '-j', '--sessions', type=int, metavar='N',
+        help='number of games served concurrently (fallback: {})'.format(
+            config.sessions))
+    parser.add_argument(
+        '--seed', type=int, metavar='N',
+        help='seed of random generator of every game (fallback: {})'.format(
+            'random' if config.seed is None else config.seed))
+    parser.add_argument(
+        '--record', metavar='PATH',
+        help='record games to a replay file, suffixed by session numbers\n'
+        'if there are multiple sessions')
+    parser.add_argument(
+        '--stats-port', type=int, metavar='PORT',
+        help='serve statistics of frames as JSON on localhost, plus\n'
+        'session numbers if there are multiple sessions\n'
+        '(fallback: {})'.format(config.stats_port))
     args = parser.parse_args()
     if args.defaultcfg is not None:
         with open(SETTINGS) as settings: args.defaultcfg.write(settings.read())
@@ -385,11 +589,18 @@ def main():
     config.read_args(args)
 
     # Main loop
-    with Game(config) as game:
-        if config.server:
-            socket_thread = Thread(target=game.remote_control)
-            socket_thread.daemon = True     # make it disposable
-            socket_thread.start()
-            while game.update(): game.control(*game.sockinp)
-        else:
-            while game.update(): game.user_control()
+    if not config.server or config.sessions < 2: return run(config)
+    server = None if config.shared_memory else listen(config)
+    record, memory, sessions = config.record, config.shared_memory, []
+    port = config.stats_port
+    for i in range(config.sessions):
+        # Each session records to its own file, serves through its own
+        # block of shared memory and statistics on its own port
+        if record is not None: config.record = '{}.{}'.format(record, i)
+        if memory is not None:
+            config.shared_memory = '{}.{}'.format(memory, i)
+        if port is not None: config.stats_port = port + i
+        sessions.append(Process(target=run, args=(config, server)))
+        sessions[-1].start()
+    for session in sessions: session.join()
+    if server is not None: server.close()
@@ -0,0 +1,180 @@
+# -*- coding: utf-8 -*-
+# graphics.py - module for drawing the maze
+# Copyright (C) 2017, 2018  Nguyễn Gia Phong
+#
+# This file is part of Brutal Maze.
+#
+# Brutal Maze is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# Brutal Maze is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with Brutal Maze.  If not, see <https://www.gnu.org/licenses/>.
+
+__doc__ = 'Brutal Maze module for drawing the maze'
+
+from collections import OrderedDict
+from math import cos, pi, sin
+
+import numpy as np
+import pygame
+from pygame.gfxdraw import filled_polygon, aapolygon
+
+from .constants import BG_COLOR, BULLET_SPEED, FG_COLOR, SQRT2, WALL
+from .misc import regpoly, regpolys, round2
+
+# Translation table marking walls as 1 and everything else as 0
+WALL_MASK = bytes(int(i == WALL) for i in range(256))
+
+
+def fill_aapolygon(surface, points, color):
+    """Draw a filled polygon with anti aliased edges onto a surface."""
+    aapolygon(surface, points, color)
+    filled_polygon(surface, points, color)
+
+
+class SpriteCache:
+    """Object caching pre-rendered regular polygons as sprites.
+
+    Sprites are keyed by the number of sides, circumradius, color and
+    angle quantized within the symmetry of the polygon, and the least
+    recently used ones are evicted once the cache is full.
+
+    Attributes:
+        size (int): maximum number of sprites to be kept
+        steps (int): number of angles a polygon can be drawn at
+            between two of its symmetric positions
+        sprites (OrderedDict): sprites, least recently used first
+    """
+    def __init__(self, size=1024, steps=60):
+        self.size, self.steps = size, steps
+        self.sprites = OrderedDict()
+
+    def render(self, n, R, angle, color):
+        """Return a new sprite of the given polygon, whose alpha channel
+        is the coverage of the polygon.
+        """
+        size = int(R*2) + 3
+        mask = pygame.Surface((size, size))
+        fill_aapolygon(mask, regpoly(n, R, angle, size/2.0, size/2.0),
+                       (255, 255, 255))
+        rgba = bytearray(bytes(color) + b'\xff') * (size*size)
+        rgba[3::4] = pygame.image.tostring(mask, 'RGB')[::3]
+        return pygame.image.fromstring(bytes(rgba), (size, size), 'RGBA')
+
+    def draw(self, surface, n, R, angle, x, y, color):
+        """Draw the regular polygon with n sides, circumradius of R,
+        the center point I(x, y) and angle of the vector from I to one
+        of its points, as fill_aapolygon would do.
+        """
+        step = pi * 2 / n / self.steps
+        key = n, R, round2(angle / step) % self.steps, color
+        try:
+            sprite = self.sprites.pop(key)
+        except KeyError:
+            sprite = self.render(n, R, key[2] * step, color)
+            if len(self.sprites) >= self.size: self.sprites.popitem(False)
+        self.sprites[key] = sprite
+        half = sprite.get_width() / 2.0
+        surface.blit(sprite, (round2(x - half), round2(y - half)))
+
+    def clear(self):
+        """Remove all sprites from the cache."""
+        self.sprites.clear()
+
+
+class Canvas:
+    """Object drawing the maze on the display.
+
+    Attributes:
+        maze (Maze): the maze
+        surface (pygame.Surface): the display to draw on
+        wall_layer (pygame.Surface): pre-rendered walls on display,
+            including sleeping enemies
+        wall_key (tuple): distance, size and walls the layer was rendered from
+        sprites (SpriteCache): pre-rendered hero, enemies and bullets
+        overlay (bool): flag indicates if statistics are shown
+        font (pygame.font.Font): font of statistics
+    """
+    def __init__(self, maze):
+        self.maze = maze
+        self.surface = pygame.display.set_mode((maze.w, maze.h),
+                                               pygame.RESIZABLE)
+        self.wall_layer = self.wall_key = None
+        self.sprites = SpriteCache()
+        self.overlay, self.font = False, None
+
+    def get_walls(self):
+        """Return the layer of walls and sleeping enemies on display,
+        which is only rendered again when they or their size change.
+        """
+        maze = self.maze
+        w, h = len(maze.rangex), len(maze.rangey)
+        walls = maze.map.window(maze.rangex[0], maze.rangey[0], w, h)
+        walls = bytearray(walls.translate(WALL_MASK))
+        for enemy in maze.enemies:  # sleeping enemies look just like walls
+            x, y = enemy.x - maze.rangex[0], enemy.y - maze.rangey[0]
+            if not enemy.awake and 0 <= x < w and 0 <= y < h:
+                walls[x*h + y] = 1
+        key = maze.distance, w, h, walls
+        if key == self.wall_key: return self.wall_layer
+
+        self.wall_key = key
+        self.maze.stats.add('wall renders')
+        self.maze.stats.set('walls', sum(walls))
+        self.wall_layer = pygame.Surface((int(w*maze.distance) + 1,
+                                          int(h*maze.distance) + 1))
+        self.wall_layer.fill(BG_COLOR)
+        x, y = np.divmod(np.flatnonzero(np.frombuffer(walls, np.uint8)), h)
+        for square in regpolys(4, maze.distance / SQRT2, pi / 4,
+                               (x+0.5) * maze.distance,
+                               (y+0.5) * maze.distance).tolist():
+            fill_aapolygon(self.wall_layer, square, FG_COLOR)
+        return self.wall_layer
+
+    def draw(self, alpha=1.0):
+        """Draw the maze as it is the given fraction of the way from
+        the state before the last update to the current one.
+        """
+        maze, surface, sprites = self.maze, self.surface, self.sprites
+        # Everything but the hero moves along with the maze
+        dx, dy = (alpha-1) * maze.dx, (alpha-1) * maze.dy
+        surface.fill(BG_COLOR)
+        if maze.next_move <= 0:
+            x, y = maze.get_pos(maze.rangex[0], maze.rangey[0])
+            surface.blit(self.get_walls(), (round2(x + dx - maze.distance/2),
+                                            round2(y + dy - maze.distance/2)))
+
+        for enemy in maze.enemies: enemy.draw(surface, sprites, dx, dy)
+        if not maze.hero.dead: maze.hero.draw(surface, sprites)
+        bullet_radius = maze.distance / 4
+        step = (alpha-1) * maze.distance * BULLET_SPEED / maze.fps
+        for bullet in maze.bullets:
+            angle = bullet.angle
+            bullet.draw(surface, bullet_radius, sprites,
+                        dx + step*cos(angle), dy + step*sin(angle))
+        if self.overlay: self.draw_stats()
+        pygame.display.flip()
+        pygame.display.set_caption(
+            'Brutal Maze - Score: {}'.format(maze.get_score()))
+
+    def draw_stats(self):
+        """Draw statistics of the maze on the top left corner."""
+        if self.font is None: self.font = pygame.font.Font(None, 20)
+        y = 0
+        for line in self.maze.stats.report():
+            text = self.font.render(line, True, FG_COLOR, BG_COLOR)
+            self.surface.blit(text, (4, y))
+            y += text.get_height()
+
+    def resize(self, size):
+        """Resize the display and the maze on it."""
+        self.maze.resize(size)
+        self.surface = pygame.display.set_mode(size, pygame.RESIZABLE)
+        self.sprites.clear()
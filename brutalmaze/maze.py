@@ -19,40 +19,117 @@
 
 __doc__ = 'Brutal Maze module for the maze class'
 
-from collections import deque
-from math import pi, log
-from random import choice, getrandbits, uniform
+from math import pi, log, floor
+from random import getrandbits, Random
+from struct import Struct
 
-import pygame
+import numpy as np
 
-from .characters import Hero, new_enemy
+from .characters import Hero, new_enemy, update_enemies
 from .constants import (
     EMPTY, WALL, HERO, ROAD_WIDTH, MAZE_SIZE, MIDDLE, INIT_SCORE, ENEMIES,
     MINW, MAXW, SQRT2, SFX_SPAWN, SFX_SLASH_ENEMY, SFX_LOSE, ADJACENT_GRIDS,
-    BG_COLOR, FG_COLOR, CELL_WIDTH, LAST_ROW, HERO_HP, ENEMY_HP, ATTACK_SPEED,
-    HERO_SPEED, BULLET_LIFETIME)
-from .misc import round2, sign, regpoly, fill_aapolygon, play
-from .weapons import Bullet
+    CELL_WIDTH, LAST_ROW, HERO_HP, ENEMY_HP, ATTACK_SPEED,
+    HERO_SPEED, BULLET_LIFETIME, SFX_MISSED)
+from .misc import sign
+from .stats import Stats
+from .weapons import ALUMINIUM, BULLET_COLORS, BulletPool, get_sfx_hit
+
+# Names of observation planes returned by Maze.get_planes
+PLANES = ['walls'] + ENEMIES + ['bullets', 'shots', 'hero']
+
+# Snapshots are made of the header, the state of the random generator,
+# weights of enemies, the hero, the enemies, indices of awake enemies in
+# the order they are found in cells, arrays of the bullets in the order
+# of BulletPool.FIELDS and finally the map data.
+SNAPSHOT = Struct('!2H4dq2d2h2d2H2HIq')
+# w, h, fps, score, centerx, centery, seed, vx, vy, rotatex, rotatey,
+# next_move, next_slashfx, map offset, enemies, indexed, bullets, next_serial
+RANDOM_STATE = Struct('!625I?d')    # Mersenne Twister state, next gauss
+WEIGHTS = Struct('!{}d'.format(len(ENEMIES)))   # by ENEMIES order
+HERO_STATE = Struct('!4d3?3d')
+# angle, next_heal, next_beat, next_strike, slashing, firing, dead,
+# spin_speed, spin_queue, wound
+ENEMY_STATE = Struct('!B2hd?2d2h4d')
+# color, x, y, angle, awake, next_strike, move_speed, offsetx, offsety,
+# spin_speed, spin_queue, wound, visible
+
+
+class Grid:
+    """Object representing a toroidal grid of bytes.
+
+    The grid is stored in a flat bytearray, column by column, and its
+    origin is kept as an offset so that rotating it costs O(1).
+
+    Attributes:
+        w, h (int): number of columns and rows
+        data (bytearray): the grids, indexed by x*h + y (unrotated)
+        x, y (int): offset of the origin in data (in grids)
+    """
+    def __init__(self, w, h):
+        self.w, self.h = w, h
+        self.data = bytearray(w * h)
+        self.x = self.y = 0
+
+    def __getitem__(self, index):
+        x, y = index
+        return self.data[(x+self.x)%self.w*self.h + (y+self.y)%self.h]
+
+    def __setitem__(self, index, value):
+        x, y = index
+        self.data[(x+self.x)%self.w*self.h + (y+self.y)%self.h] = value
+
+    def rotate(self, x=0, y=0):
+        """Rotate the grid x columns to the right and y rows down,
+        in the same manner as deque.rotate.
+        """
+        self.x = (self.x-x) % self.w
+        self.y = (self.y-y) % self.h
+
+    def window(self, x, y, w, h):
+        """Return the w*h grids whose top left one is (x, y) as bytes,
+        column by column.
+        """
+        columns = []
+        for i in range(x, x + w):
+            start = (i+self.x)%self.w * self.h
+            j = (y+self.y) % self.h
+            columns.append(self.data[start+j:start+min(j+h, self.h)])
+            if j + h > self.h:
+                columns.append(self.data[start:start+j+h-self.h])
+        return b''.join(columns)
+
+    def take(self, xs, ys):
+        """Return the grids at the given arrays of coordinates."""
+        data = np.frombuffer(self.data, np.uint8)
+        return data[(xs+self.x)%self.w*self.h + (ys+self.y)%self.h]
+
+    def set_column(self, x, values, y=0):
+        """Overwrite column x with values, starting from row y."""
+        start = (x+self.x)%self.w * self.h
+        i = (y+self.y) % self.h
+        self.data[start+i:start+self.h] = values[:self.h-i]
+        self.data[start:start+i] = values[self.h-i:]
 
 
 def new_cell(bit, upper=True):
     """Return a half of a cell of the maze based on the given bit."""
-    if bit: return deque([WALL]*ROAD_WIDTH + [EMPTY]*ROAD_WIDTH)
-    if upper: return deque([WALL] * (ROAD_WIDTH<<1))
-    return deque([EMPTY] * (ROAD_WIDTH<<1))
+    if bit: return bytearray([WALL]*ROAD_WIDTH + [EMPTY]*ROAD_WIDTH)
+    if upper: return bytearray([WALL] * (ROAD_WIDTH<<1))
+    return bytearray([EMPTY] * (ROAD_WIDTH<<1))
 
 
-def new_column():
-    """Return a newly generated column of the maze."""
-    column = deque()
-    upper, lower = deque(), deque()
+def new_column(grid, rng, x, y=0):
+    """Generate a new column of the maze in place using the random
+    generator, from column x of the grid and rotated down y rows.
+    """
+    upper, lower = bytearray(), bytearray()
     for _ in range(MAZE_SIZE):
-        b = getrandbits(1)
+        b = rng.getrandbits(1)
         upper.extend(new_cell(b))
         lower.extend(new_cell(b, False))
-    for _ in range(ROAD_WIDTH): column.append(upper.__copy__())
-    for _ in range(ROAD_WIDTH): column.append(lower.__copy__())
-    return column
+    for i in range(ROAD_WIDTH): grid.set_column(x + i, upper, y)
+    for i in range(ROAD_WIDTH, CELL_WIDTH): grid.set_column(x + i, lower, y)
 
 
 class Maze:
@@ -61,53 +138,60 @@ class Maze:
     Attributes:
         w, h (int): width and height of the display (in px)
         fps (float): current frame rate
-        surface (pygame.Surface): the display to draw on
         distance (float): distance between centers of grids (in px)
         x, y (int): coordinates of the center of the hero (in px)
         centerx, centery (float): center grid's center's coordinates (in px)
         rangex, rangey (list): range of the index of the grids on display
+        planes (numpy.ndarray): buffer of observation planes
         score (float): current score
-        map (deque of deque): map of grids representing objects on the maze
+        seed (int): seed of the random generator for the current game
+        rng (Random): random generator of the maze
+        map (Grid): map of grids representing objects on the maze
         vx, vy (float): velocity of the maze movement (in pixels per frame)
+        dx, dy (float): movement of the maze in the last update (in px)
         rotatex, rotatey (int): grids rotated
-        bullets (list of Bullet): flying bullets
+        bullets (BulletPool): flying bullets
         enemy_weights (dict): probabilities of enemies to be created
         enemies (list of Enemy): alive enemies
+        cells (dict): lists of awake enemies by the grids they are in
         hero (Hero): the hero
         next_move (float): time until the hero gets mobilized (in ms)
         next_slashfx (float): time until next slash effect of the hero (in ms)
         slashd (float): minimum distance for slashes to be effective
-        sfx_slash (pygame.mixer.Sound): sound effect of slashed enemy
-        sfx_lose (pygame.mixer.Sound): sound effect to be played when you lose
+        sounds (list): sound effects requested during the last update,
+            as tuples of their paths, volumes and angles
+        stats (Stats): timings of phases of updates and counters
+        sfx_slash (str): sound effect of slashed enemy
+        sfx_lose (str): sound effect to be played when you lose
     """
-    def __init__(self, fps, size, headless):
+    def __init__(self, fps, size, seed=None):
         self.fps = fps
         self.w, self.h = size
-        if headless:
-            self.surface = None
-        else:
-            self.surface = pygame.display.set_mode(size, pygame.RESIZABLE)
-
         self.distance = (self.w * self.h / 416) ** 0.5
         self.x, self.y = self.w // 2, self.h // 2
         self.centerx, self.centery = self.w / 2.0, self.h / 2.0
         w, h = (int(i/self.distance/2 + 1) for i in size)
         self.rangex = list(range(MIDDLE - w, MIDDLE + w + 1))
         self.rangey = list(range(MIDDLE - h, MIDDLE + h + 1))
+        self.planes = None
         self.score = INIT_SCORE
+        self.seed = getrandbits(32) if seed is None else seed
+        self.rng = Random(self.seed)
 
-        self.map = deque()
-        for _ in range(MAZE_SIZE): self.map.extend(new_column())
-        self.vx = self.vy = 0.0
+        self.map = Grid(MAZE_SIZE * CELL_WIDTH, MAZE_SIZE * CELL_WIDTH)
+        for i in range(MAZE_SIZE): new_column(self.map, self.rng, i*CELL_WIDTH)
+        self.vx = self.vy = self.dx = self.dy = 0.0
         self.rotatex = self.rotatey = 0
-        self.bullets, self.enemies = [], []
+        self.bullets, self.enemies = BulletPool(), []
+        self.cells = {}
         self.enemy_weights = {color: MINW for color in ENEMIES}
         self.add_enemy()
-        self.hero = Hero(self.surface, fps, size)
-        self.map[MIDDLE][MIDDLE] = HERO
+        self.hero = Hero(self, fps, size)
+        self.map[MIDDLE, MIDDLE] = HERO
         self.next_move = self.next_slashfx = 0.0
         self.slashd = self.hero.R + self.distance/SQRT2
 
+        self.sounds, self.stats = [], Stats()
         self.sfx_spawn = SFX_SPAWN
         self.sfx_slash = SFX_SLASH_ENEMY
         self.sfx_lose = SFX_LOSE
@@ -115,65 +199,129 @@ class Maze:
     def add_enemy(self):
         """Add enough enemies."""
         walls = [(i, j) for i in self.rangex for j in self.rangey
-                 if self.map[i][j] == WALL]
+                 if self.map[i, j] == WALL]
         plums = [e for e in self.enemies if e.color == 'Plum' and e.awake]
-        plum = choice(plums) if plums else None
+        plum = self.rng.choice(plums) if plums else None
         num = log(self.score, INIT_SCORE)
         while walls and len(self.enemies) < num:
-            x, y = choice(walls)
-            if all(self.map[x + a][y + b] == WALL for a, b in ADJACENT_GRIDS):
+            x, y = self.rng.choice(walls)
+            if all(self.map[x + a, y + b] == WALL for a, b in ADJACENT_GRIDS):
                 continue
             enemy = new_enemy(self, x, y)
             self.enemies.append(enemy)
             if plum is None or not plum.clone(enemy):
                 walls.remove((x, y))
             else:
-                self.map[x][y] = WALL
+                self.map[x, y] = WALL
+
+    def index_enemy(self, enemy):
+        """Add the awake enemy to the list of its grid in cells."""
+        self.cells.setdefault((enemy.x, enemy.y), []).append(enemy)
+
+    def unindex_enemy(self, enemy):
+        """Remove the awake enemy from the list of its grid in cells."""
+        cell = self.cells[enemy.x, enemy.y]
+        cell.remove(enemy)
+        if not cell: del self.cells[enemy.x, enemy.y]
+
+    def get_target(self, x, y):
+        """Return an awake enemy whose center is closer than the distance
+        between grids to the point (x, y), or None if there is none.
+        """
+        # Enemies are always less than a grid away from their own grids
+        i = int(floor((x-self.centerx) / self.distance)) + MIDDLE
+        j = int(floor((y-self.centery) / self.distance)) + MIDDLE
+        d = self.distance ** 2
+        for gridx in range(i - 1, i + 3):
+            for gridy in range(j - 1, j + 3):
+                for enemy in self.cells.get((gridx, gridy), ()):
+                    ex, ey = enemy.get_pos()
+                    if (x-ex)**2 + (y-ey)**2 < d: return enemy
+        return None
 
     def get_pos(self, x, y):
         """Return coordinate of the center of the grid (x, y)."""
         return (self.centerx + (x - MIDDLE)*self.distance,
                 self.centery + (y - MIDDLE)*self.distance)
 
+    def get_planes(self):
+        """Return observation planes of the grids on display, as a NumPy
+        array of shape (len(PLANES), rows, columns).  The array is reused
+        and overwritten by later calls.
+
+        Walls and sleeping enemies are marked by 1 on the walls plane
+        unless the hero is frozen.  Grids of awake enemies which can be
+        seen and of the hero are marked on their planes by the remaining
+        fractions of their HP, while bullets are counted on the bullets
+        plane and the hero's ones on the shots plane.
+        """
+        w, h = len(self.rangex), len(self.rangey)
+        if self.planes is None or self.planes.shape[1:] != (h, w):
+            self.planes = np.empty((len(PLANES), h, w), np.float32)
+        planes, left, top = self.planes, self.rangex[0], self.rangey[0]
+        planes.fill(0.0)
+        if self.next_move <= 0:
+            planes[0] = self.map.take(np.arange(left, left + w),
+                                      np.arange(top, top + h)[:, None]) == WALL
+
+        layers, xs, ys, values = [], [], [], []
+        for enemy in self.enemies:
+            if not enemy.awake:
+                if self.next_move <= 0:
+                    planes[0, enemy.y-top, enemy.x-left] = 1
+                continue
+            elif not enemy.is_visible():
+                continue
+            x, y = enemy.get_pos()
+            layers.append(PLANES.index(enemy.color))
+            xs.append(x)
+            ys.append(y)
+            values.append(1 - enemy.wound/ENEMY_HP)
+        layers.append(len(PLANES) - 1)
+        xs.append(self.x)
+        ys.append(self.y)
+        values.append(1 - self.hero.wound/HERO_HP)
+
+        self.scatter(np.array(layers), np.array(xs), np.array(ys),
+                     np.array(values))
+        bullets = self.bullets
+        layers = np.where(bullets.color == ALUMINIUM, len(PLANES) - 2,
+                          len(PLANES) - 3)
+        self.scatter(layers, bullets.x, bullets.y, 1)
+        return planes
+
+    def scatter(self, layers, xs, ys, values):
+        """Add values to the grids of planes in the given layers, which
+        the points (xs, ys) are in, if they are on display.
+        """
+        left, top = self.rangex[0], self.rangey[0]
+        columns = np.rint((xs-self.centerx) / self.distance).astype(int)
+        rows = np.rint((ys-self.centery) / self.distance).astype(int)
+        columns += MIDDLE - left
+        rows += MIDDLE - top
+        inside = ((0 <= columns) & (columns < len(self.rangex))
+                  & (0 <= rows) & (rows < len(self.rangey)))
+        if not np.isscalar(values): values = values[inside]
+        np.add.at(self.planes,
+                  (layers[inside], rows[inside], columns[inside]), values)
+
     def get_score(self):
         """Return the current score."""
         return int(self.score - INIT_SCORE)
 
-    def draw(self):
-        """Draw the maze."""
-        self.surface.fill(BG_COLOR)
-        if self.next_move <= 0:
-            for i in self.rangex:
-                for j in self.rangey:
-                    if self.map[i][j] != WALL: continue
-                    x, y = self.get_pos(i, j)
-                    square = regpoly(4, self.distance / SQRT2, pi / 4, x, y)
-                    fill_aapolygon(self.surface, square, FG_COLOR)
-
-        for enemy in self.enemies: enemy.draw()
-        if not self.hero.dead: self.hero.draw()
-        bullet_radius = self.distance / 4
-        for bullet in self.bullets: bullet.draw(bullet_radius)
-        pygame.display.flip()
-        pygame.display.set_caption(
-            'Brutal Maze - Score: {}'.format(self.get_score()))
-
     def rotate(self):
         """Rotate the maze if needed."""
         x = int((self.centerx-self.x) * 2 / self.distance)
         y = int((self.centery-self.y) * 2 / self.distance)
         if x == y == 0: return
-        for enemy in self.enemies: self.map[enemy.x][enemy.y] = EMPTY
-        self.map[MIDDLE][MIDDLE] = EMPTY
-        if x:
-            self.centerx -= x * self.distance
-            self.map.rotate(x)
-            self.rotatex += x
-        if y:
-            self.centery -= y * self.distance
-            for d in self.map: d.rotate(y)
-            self.rotatey += y
-        self.map[MIDDLE][MIDDLE] = HERO
+        for enemy in self.enemies: self.map[enemy.x, enemy.y] = EMPTY
+        self.map[MIDDLE, MIDDLE] = EMPTY
+        self.map.rotate(x, y)
+        self.centerx -= x * self.distance
+        self.rotatex += x
+        self.centery -= y * self.distance
+        self.rotatey += y
+        self.map[MIDDLE, MIDDLE] = HERO
 
         # Respawn the enemies that fall off the display
         killist = []
@@ -189,21 +337,18 @@ class Maze:
         # Regenerate the maze
         if abs(self.rotatex) == CELL_WIDTH:
             self.rotatex = 0
-            for _ in range(CELL_WIDTH): self.map.pop()
-            self.map.extend(new_column())
-            for i in range(-CELL_WIDTH, 0):
-                self.map[i].rotate(self.rotatey)
+            new_column(self.map, self.rng, -CELL_WIDTH, self.rotatey)
         if abs(self.rotatey) == CELL_WIDTH:
             self.rotatey = 0
             for i in range(MAZE_SIZE):
-                b, c = getrandbits(1), (i-1)*CELL_WIDTH + self.rotatex
+                b, c = self.rng.getrandbits(1), (i-1)*CELL_WIDTH + self.rotatex
                 for j, grid in enumerate(new_cell(b)):
                     for k in range(ROAD_WIDTH):
-                        self.map[c + k][LAST_ROW + j] = grid
+                        self.map[c + k, LAST_ROW + j] = grid
                 c += ROAD_WIDTH
                 for j, grid in enumerate(new_cell(b, False)):
                     for k in range(ROAD_WIDTH):
-                        self.map[c + k][LAST_ROW + j] = grid
+                        self.map[c + k, LAST_ROW + j] = grid
 
     def get_distance(self, x, y):
         """Return the distance from the center of the maze to the point
@@ -211,9 +356,15 @@ class Maze:
         """
         return ((self.x-x)**2 + (self.y-y)**2)**0.5
 
+    def play(self, sound, volume=1.0, angle=None):
+        """Request the sound effect to be played at the given volume,
+        from the given angle if any.
+        """
+        self.sounds.append((sound, volume, angle))
+
     def hit_hero(self, wound, color):
         """Handle the hero when he loses HP."""
-        fx = (uniform(0, sum(self.enemy_weights.values()))
+        fx = (self.rng.uniform(0, sum(self.enemy_weights.values()))
               < self.enemy_weights[color])
         if (color == 'Butter' or color == 'ScarletRed') and fx:
             self.hero.wound += wound * 2.5
@@ -237,7 +388,7 @@ class Maze:
             if d > 0:
                 wound = d * SQRT2 / self.distance
                 if self.next_slashfx <= 0:
-                    play(self.sfx_slash, wound, enemy.get_angle())
+                    self.play(self.sfx_slash, wound, enemy.get_angle())
                     self.next_slashfx = ATTACK_SPEED
                 enemy.hit(wound / self.hero.spin_speed)
                 if enemy.wound >= ENEMY_HP:
@@ -252,46 +403,48 @@ class Maze:
         if (self.hero.firing and not self.hero.slashing
             and self.hero.next_strike <= 0):
             self.hero.next_strike = ATTACK_SPEED
-            self.bullets.append(Bullet(self.surface, self.x, self.y,
-                                       self.hero.angle, 'Aluminium'))
+            self.bullets.append(self.x, self.y, self.hero.angle, 'Aluminium')
 
-        fallen = []
+        bullets = self.bullets
+        if not len(bullets): return
         block = (self.hero.spin_queue and self.hero.next_heal <= 0
                  and self.hero.next_strike > self.hero.spin_queue / self.fps)
 
-        for i, bullet in enumerate(self.bullets):
-            wound = bullet.fall_time / BULLET_LIFETIME
-            bullet.update(self.fps, self.distance)
-            if wound < 0:
-                fallen.append(i)
-            elif bullet.color == 'Aluminium':
-                x = MIDDLE + round2((bullet.x-self.x) / self.distance)
-                y = MIDDLE + round2((bullet.y-self.y) / self.distance)
-                if self.map[x][y] == WALL and self.next_move <= 0:
-                    fallen.append(i)
-                    continue
-                for j, enemy in enumerate(self.enemies):
-                    if not enemy.awake: continue
-                    x, y = enemy.get_pos()
-                    if bullet.get_distance(x, y) < self.distance:
-                        enemy.hit(wound)
-                        if enemy.wound >= ENEMY_HP:
-                            self.score += enemy.wound
-                            enemy.die()
-                            self.enemies.pop(j)
-                        play(bullet.sfx_hit, wound, bullet.angle)
-                        fallen.append(i)
-                        break
-            elif bullet.get_distance(self.x, self.y) < self.distance:
-                if block:
-                    self.hero.next_strike = (abs(self.hero.spin_queue/self.fps)
-                                             + ATTACK_SPEED)
-                    play(bullet.sfx_missed, wound, bullet.angle + pi)
-                else:
-                    self.hit_hero(wound, bullet.color)
-                    play(bullet.sfx_hit, wound, bullet.angle + pi)
-                fallen.append(i)
-        for i in reversed(fallen): self.bullets.pop(i)
+        wounds = bullets.fall_time / BULLET_LIFETIME
+        bullets.update(self.fps, self.distance)
+        fallen = wounds < 0
+        heros = (bullets.color == ALUMINIUM) & ~fallen
+        if self.next_move <= 0:
+            x = MIDDLE + np.rint((bullets.x-self.x) / self.distance)
+            y = MIDDLE + np.rint((bullets.y-self.y) / self.distance)
+            fallen |= heros & (self.map.take(x.astype(int), y.astype(int))
+                               == WALL)
+            heros &= ~fallen
+
+        for i in np.flatnonzero(heros):
+            enemy = self.get_target(float(bullets.x[i]), float(bullets.y[i]))
+            if enemy is None: continue
+            wound = float(wounds[i])
+            enemy.hit(wound)
+            if enemy.wound >= ENEMY_HP:
+                self.score += enemy.wound
+                enemy.die()
+                self.enemies.remove(enemy)
+            self.play(get_sfx_hit(ALUMINIUM), wound, bullets.angle[i])
+            fallen[i] = True
+
+        hits = ((bullets.x-self.x)**2 + (bullets.y-self.y)**2
+                < self.distance**2) & (bullets.color != ALUMINIUM) & ~fallen
+        for i in np.flatnonzero(hits):
+            wound, angle = float(wounds[i]), bullets.angle[i] + pi
+            if block:
+                self.hero.next_strike = (abs(self.hero.spin_queue/self.fps)
+                                         + ATTACK_SPEED)
+                self.play(SFX_MISSED, wound, angle)
+            else:
+                self.hit_hero(wound, BULLET_COLORS[bullets.color[i]])
+                self.play(get_sfx_hit(bullets.color[i]), wound, angle)
+        bullets.keep(~(fallen | hits))
 
     def is_valid_move(self, vx=0.0, vy=0.0):
         """Return dx or dy if it it valid to move the maze in that
@@ -303,7 +456,7 @@ class Maze:
             for gridy in range(MIDDLE - dy - 1, MIDDLE - dy + 2):
                 x, y = self.get_pos(gridx, gridy)
                 if (max(abs(herox - x), abs(heroy - y)) < d
-                    and self.map[gridx][gridy] == WALL):
+                    and self.map[gridx, gridy] == WALL):
                     return 0.0
         for enemy in self.enemies:
             x, y = self.get_pos(enemy.x, enemy.y)
@@ -312,32 +465,66 @@ class Maze:
                 return 0.0
         return vx or vy
 
+    def move(self, x, y, fps):
+        """Command the hero to move faster in the given direction."""
+        x, y = -x, -y # or move the maze in the reverse direction
+        velocity = self.distance * HERO_SPEED / fps
+        accel = velocity * HERO_SPEED / fps
+
+        if self.next_move > 0 or not x:
+            self.vx -= sign(self.vx) * accel
+            if abs(self.vx) < accel * 2: self.vx = 0.0
+        elif x * self.vx < 0:
+            self.vx += x * 2 * accel
+        else:
+            self.vx += x * accel
+            if abs(self.vx) > velocity: self.vx = x * velocity
+
+        if self.next_move > 0 or not y:
+            self.vy -= sign(self.vy) * accel
+            if abs(self.vy) < accel * 2: self.vy = 0.0
+        elif y * self.vy < 0:
+            self.vy += y * 2 * accel
+        else:
+            self.vy += y * accel
+            if abs(self.vy) > velocity: self.vy = y * velocity
+
     def update(self, fps):
         """Update the maze."""
-        self.fps = fps
+        self.fps, self.sounds, stats = fps, [], self.stats
+        stats.start()
         dx = self.is_valid_move(vx=self.vx)
         self.centerx += dx
         dy = self.is_valid_move(vy=self.vy)
         self.centery += dy
+        self.dx, self.dy = dx, dy
+        stats.lap('move')
 
         self.next_move -= 1000.0 / self.fps
         self.next_slashfx -= 1000.0 / self.fps
 
         self.rotate()
+        stats.lap('rotate')
         if dx or dy:
             for enemy in self.enemies: enemy.wake()
-            for bullet in self.bullets: bullet.place(dx, dy)
+            self.bullets.place(dx, dy)
+        stats.lap('wake')
 
-        for enemy in self.enemies: enemy.update()
+        update_enemies(self, self.enemies)
+        stats.lap('update enemies')
         if not self.hero.dead:
             self.hero.update(fps)
             self.slash()
+        stats.lap('update hero')
         self.track_bullets()
+        stats.lap('track bullets')
+        stats.set('enemies', len(self.enemies))
+        stats.set('awake enemies', sum(map(len, self.cells.values())))
+        stats.set('bullets', len(self.bullets))
 
     def resize(self, size):
         """Resize the maze."""
         self.w, self.h = size
-        self.surface = pygame.display.set_mode(size, pygame.RESIZABLE)
         self.hero.resize(size)
 
         offsetx = (self.centerx-self.x) / self.distance
@@ -360,21 +547,115 @@ class Maze:
         self.hero.dead = True
         self.hero.slashing = self.hero.firing = False
         self.vx = self.vy = 0.0
-        play(self.sfx_lose)
+        self.play(self.sfx_lose)
 
-    def reinit(self):
-        """Open new game."""
+    def snapshot(self):
+        """Return the state of the current game as bytes, which can be
+        restored later, by another maze or in another process.
+        """
+        hero, bullets = self.hero, self.bullets
+        order = {enemy: i for i, enemy in enumerate(self.enemies)}
+        indexed = [order[enemy] for cell in self.cells.values()
+                   for enemy in cell]
+        version, state, gauss = self.rng.getstate()
+        data = [SNAPSHOT.pack(
+                    self.w, self.h, self.fps, self.score, self.centerx,
+                    self.centery, self.seed, self.vx, self.vy, self.rotatex,
+                    self.rotatey, self.next_move, self.next_slashfx,
+                    self.map.x, self.map.y, len(self.enemies), len(indexed),
+                    len(bullets), bullets.next_serial),
+                RANDOM_STATE.pack(*(state + (gauss is not None, gauss or 0))),
+                WEIGHTS.pack(*(self.enemy_weights[c] for c in ENEMIES)),
+                HERO_STATE.pack(
+                    hero.angle, hero.next_heal, hero.next_beat,
+                    hero.next_strike, hero.slashing, hero.firing, hero.dead,
+                    hero.spin_speed, hero.spin_queue, hero.wound)]
+        for enemy in self.enemies:
+            data.append(ENEMY_STATE.pack(
+                ENEMIES.index(enemy.color), enemy.x, enemy.y, enemy.angle,
+                enemy.awake, enemy.next_strike, enemy.move_speed,
+                enemy.offsetx, enemy.offsety, enemy.spin_speed,
+                enemy.spin_queue, enemy.wound, getattr(enemy, 'visible', 0)))
+        data.append(Struct('!{}H'.format(len(indexed))).pack(*indexed))
+        for field in bullets.FIELDS:
+            array = getattr(bullets, field)
+            data.append(array.astype(array.dtype.newbyteorder('>')).tobytes())
+        data.append(self.map.data)
+        return b''.join(data)
+
+    def restore(self, data):
+        """Restore the game, including the size of the maze, to the state
+        in the given snapshot.
+        """
+        (w, h, self.fps, self.score, centerx, centery, self.seed,
+         self.vx, self.vy, self.rotatex, self.rotatey, self.next_move,
+         self.next_slashfx, x, y, enemies, indexed, bullets,
+         next_serial) = SNAPSHOT.unpack_from(data)
+        if (w, h) != (self.w, self.h): self.resize((w, h))
+        self.centerx, self.centery = centerx, centery
+        self.dx = self.dy = 0.0
+        offset = SNAPSHOT.size
+
+        state = RANDOM_STATE.unpack_from(data, offset)
+        self.rng.setstate((3, state[:-2], state[-1] if state[-2] else None))
+        offset += RANDOM_STATE.size
+        self.enemy_weights = dict(zip(ENEMIES,
+                                      WEIGHTS.unpack_from(data, offset)))
+        offset += WEIGHTS.size
+        hero = self.hero
+        (hero.angle, hero.next_heal, hero.next_beat, hero.next_strike,
+         hero.slashing, hero.firing, hero.dead, hero.spin_speed,
+         hero.spin_queue, hero.wound) = HERO_STATE.unpack_from(data, offset)
+        offset += HERO_STATE.size
+
+        self.enemies, self.cells = [], {}
+        stop = offset + enemies*ENEMY_STATE.size
+        states = ENEMY_STATE.iter_unpack(memoryview(data)[offset:stop])
+        for (color, ex, ey, angle, awake, next_strike, move_speed,
+             offsetx, offsety, spin_speed, spin_queue, wound,
+             visible) in states:
+            enemy = new_enemy(self, ex, ey, ENEMIES[color])
+            enemy.angle, enemy.awake = angle, awake
+            enemy.next_strike, enemy.move_speed = next_strike, move_speed
+            enemy.offsetx, enemy.offsety = offsetx, offsety
+            enemy.spin_speed, enemy.spin_queue = spin_speed, spin_queue
+            enemy.wound = wound
+            if hasattr(enemy, 'visible'): enemy.visible = visible
+            self.enemies.append(enemy)
+        indices = Struct('!{}H'.format(indexed))
+        for i in indices.unpack_from(data, stop):
+            self.index_enemy(self.enemies[i])
+        offset = stop + indices.size
+
+        self.bullets = BulletPool()
+        for field in self.bullets.FIELDS:
+            dtype = getattr(self.bullets, field).dtype
+            array = np.frombuffer(data, dtype.newbyteorder('>'),
+                                  bullets, offset)
+            setattr(self.bullets, field, array.astype(dtype))
+            offset += array.nbytes
+        self.bullets.next_serial = next_serial
+        # Enemies above have marked their grids, so the map goes last
+        self.map.x, self.map.y = x, y
+        self.map.data[:] = data[offset:]
+        self.sounds = []
+
+    def reinit(self, seed=None):
+        """Open new game, whose random generator is seeded by the given
+        seed or a random one if it is None.
+        """
         self.centerx, self.centery = self.w / 2.0, self.h / 2.0
         self.score = INIT_SCORE
-        self.map = deque()
-        for _ in range(MAZE_SIZE): self.map.extend(new_column())
-        self.vx = self.vy = 0.0
+        self.seed = getrandbits(32) if seed is None else seed
+        self.rng.seed(self.seed)
+        self.map = Grid(MAZE_SIZE * CELL_WIDTH, MAZE_SIZE * CELL_WIDTH)
+        for i in range(MAZE_SIZE): new_column(self.map, self.rng, i*CELL_WIDTH)
+        self.vx = self.vy = self.dx = self.dy = 0.0
         self.rotatex = self.rotatey = 0
-        self.bullets, self.enemies = [], []
+        self.bullets, self.enemies = BulletPool(), []
+        self.cells = {}
         self.enemy_weights = {color: MINW for color in ENEMIES}
         self.add_enemy()
-
+        self.hero.reset(self.fps)
+        self.map[MIDDLE, MIDDLE] = HERO
         self.next_move = self.next_slashfx = 0.0
-        self.hero.next_heal = self.hero.next_strike = 0
-        self.hero.slashing = self.hero.firing = self.hero.dead = False
-        self.hero.spin_queue = self.hero.wound = 0.0
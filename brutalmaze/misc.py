@@ -19,11 +19,10 @@
 
 __doc__ = 'Brutal Maze module for miscellaneous functions'
 
+from functools import lru_cache
 from math import degrees, cos, sin, pi
-from random import uniform
 
-import pygame
-from pygame.gfxdraw import filled_polygon, aapolygon
+import numpy as np
 
 
 def round2(number):
@@ -31,9 +30,23 @@ def round2(number):
     return int(round(number))
 
 
-def randsign():
-    """Return either -1 or 1 (kind of) randomly."""
-    return (pygame.time.get_ticks() & 1)*2 - 1
+def randsign(rng):
+    """Return either -1 or 1 randomly, using the random generator."""
+    return rng.getrandbits(1)*2 - 1
+
+
+@lru_cache(maxsize=1024)
+def unit_regpoly(n, r):
+    """Return the cosines and sines of the angles of the vectors from
+    the center to the points of the regular polygon with n sides, one
+    of which has angle r (in radians).
+
+    Since callers only draw polygons at a limited number of angles,
+    the results are cached.
+    """
+    r %= pi * 2
+    angles = [r + pi*2*side/n for side in range(n)]
+    return tuple((cos(angle), sin(angle)) for angle in angles)
 
 
 def regpoly(n, R, r, x, y):
@@ -41,15 +54,20 @@ def regpoly(n, R, r, x, y):
     circumradius of R, the center point I(x, y) and one point A make the
     vector IA with angle r (in radians).
     """
-    r %= pi * 2
-    angles = [r + pi*2*side/n for side in range(n)]
-    return [(x + R*cos(angle), y + R*sin(angle)) for angle in angles]
+    return [(x + R*c, y + R*s) for c, s in unit_regpoly(n, r)]
 
 
-def fill_aapolygon(surface, points, color):
-    """Draw a filled polygon with anti aliased edges onto a surface."""
-    aapolygon(surface, points, color)
-    filled_polygon(surface, points, color)
+def regpolys(n, R, r, xs, ys):
+    """Return the points of the regular polygons with n sides,
+    circumradius of R and the given centers, each of which has one point
+    making a vector from the center with angle r (in radians), as
+    an array of shape (len(xs), n, 2).
+    """
+    unit = np.array(unit_regpoly(n, r)) * R
+    points = np.empty((len(xs), n, 2))
+    points[:, :, 0] = np.asarray(xs, float)[:, np.newaxis] + unit[:, 0]
+    points[:, :, 1] = np.asarray(ys, float)[:, np.newaxis] + unit[:, 1]
+    return points
 
 
 def sign(n):
@@ -59,43 +77,18 @@ def sign(n):
 
 def deg(x):
     """Convert angle x from radians to degrees casted to a nonnegative
-    integer.
+    integer no greater than 360.
     """
-    return round2((lambda a: a if a > 0 else a + 360)(degrees(x)))
-
+    return round2((lambda a: a if a > 0 else a + 360)(degrees(x) % 360))
 
-def cosin(x):
-    """Return the sum of cosine and sine of x (measured in radians)."""
-    return cos(x) + sin(x)
 
-
-def choices(d):
+def choices(d, rng):
     """Choose a random key from a dict which has values being relative
-    weights of the coresponding keys.
+    weights of the coresponding keys, using the random generator.
     """
     population, weights = tuple(d.keys()), tuple(d.values())
     cum_weights = [weights[0]]
     for weight in weights[1:]: cum_weights.append(cum_weights[-1] + weight)
-    num = uniform(0, cum_weights[-1])
+    num = rng.uniform(0, cum_weights[-1])
     for i, w in enumerate(cum_weights):
         if num <= w: return population[i]
-
-
-def play(sound, volume=1.0, angle=None):
-    """Play a pygame.mixer.Sound at the given volume."""
-    if pygame.mixer.get_init() is None: return
-    if pygame.mixer.find_channel() is None:
-        pygame.mixer.set_num_channels(pygame.mixer.get_num_channels() + 1)
-
-    channel = sound.play()
-    if angle is None:
-        channel.set_volume(volume)
-    else:
-        delta = cos(angle)
-        volumes = [volume * (1-delta), volume * (1+delta)]
-        for i, v in enumerate(volumes):
-            if v > 1:
-                volumes[i - 1] += v - 1
-                volumes[i] = 1.0
-        sound.set_volume(1.0)
-        channel.set_volume(*volumes)
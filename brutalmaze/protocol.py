@@ -0,0 +1,217 @@
+# -*- coding: utf-8 -*-
+# protocol.py - module for exporting the maze to remote clients
+# Copyright (C) 2017, 2018  Nguyễn Gia Phong
+#
+# This file is part of Brutal Maze.
+#
+# Brutal Maze is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# Brutal Maze is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with Brutal Maze.  If not, see <https://www.gnu.org/licenses/>.
+
+__doc__ = 'Brutal Maze module for exporting the maze to remote clients'
+
+from struct import Struct
+
+from .constants import COLORS, WALL
+from .misc import deg, round2
+
+# Binary frames are made of a header, the wall bitmap (row by row, most
+# significant bit first, padded to a whole byte), the hero, the enemies
+# and the bullets.  Colors are encoded by their one-byte codes in COLORS.
+HEADER = Struct('!4Hi')     # rows, columns, enemies, bullets, score
+HERO = Struct('!chhH??')    # color, x, y, angle, attackable, mobility
+OBJECT = Struct('!chhH')    # color, x, y, angle
+
+# Delta frames start with either K or D.  K is followed by a binary frame
+# whose enemies and bullets are prefixed by their identifiers, after which
+# the client should forget everything from previous frames.  D is followed
+# by a header, the hero, then indices (row*columns + column) of the walls
+# which appear or disappear, identifiers of removed objects, new or reset
+# enemies and bullets, and finally the objects which moved or changed color.
+DELTA = Struct('!i5H')      # score, walls, removed, enemies, bullets, moved
+KEYED = Struct('!HchhH')    # identifier, color, x, y, angle
+MOVED = Struct('!Hcbbh')    # identifier, color, dx, dy, delta angle
+INDEX = Struct('!H')        # wall index or identifier
+
+
+def expos(maze, x, y):
+    """Return position of the given coordinates in rounded percent."""
+    cx = (x+maze.x-maze.centerx) / maze.distance * 100
+    cy = (y+maze.y-maze.centery) / maze.distance * 100
+    return round2(cx), round2(cy)
+
+
+def export_state(maze):
+    """Return the visible walls as a list of rows, the hero as a tuple
+    and enemies and bullets of the maze as lists of pairs of the object
+    and its record.  Records are tuples of color code, coordinates
+    (in rounded percent) and angle (in degrees).
+    """
+    hero = maze.hero
+    x, y = expos(maze, maze.x, maze.y)
+    hero = (COLORS[hero.get_color()], x, y, deg(hero.angle),
+            hero.next_strike <= 0, hero.next_heal <= 0)
+
+    walls = [[1 if maze.map[x, y] == WALL else 0 for x in maze.rangex]
+             for y in maze.rangey] if maze.next_move <= 0 else []
+    enemies, bullets = [], []
+
+    for enemy in maze.enemies:
+        if not enemy.awake and walls:
+            walls[enemy.y-maze.rangey[0]][enemy.x-maze.rangex[0]] = WALL
+            continue
+        elif not enemy.is_visible():
+            continue
+        x, y = expos(maze, *enemy.get_pos())
+        enemies.append((enemy, (COLORS[enemy.get_color()], x, y,
+                                deg(enemy.angle))))
+
+    for bullet in maze.bullets:
+        color = COLORS[bullet.get_color()]
+        if color != '0':
+            x, y = expos(maze, bullet.x, bullet.y)
+            bullets.append((bullet, (color, x, y, deg(bullet.angle))))
+    return walls, hero, enemies, bullets
+
+
+def export_text(maze):
+    """Export maze data to a bytes object in the text format."""
+    walls, hero, enemies, bullets = export_state(maze)
+    lines = ['{} {} {} {}'.format(len(walls), len(enemies), len(bullets),
+                                  maze.get_score())]
+    if walls: lines.append('\n'.join(''.join(str(cell) for cell in row)
+                                     for row in walls))
+    lines.append('{} {} {} {} {:d} {:d}'.format(*hero))
+    lines.extend('{} {} {} {}'.format(*record) for _, record in enemies)
+    lines.extend('{} {} {} {}'.format(*record) for _, record in bullets)
+    return '\n'.join(lines).encode()
+
+
+def pack_walls(walls):
+    """Return the bitmap of walls as an int and its length in bytes."""
+    if not walls: return 0, 0
+    bits = ''.join(''.join(str(cell) for cell in row) for row in walls)
+    length = (len(bits)+7) // 8
+    return int(bits, 2) << length*8-len(bits), length
+
+
+def pack_hero(hero):
+    """Return the hero packed in the binary format."""
+    color, x, y, angle, attackable, mobility = hero
+    return HERO.pack(color.encode(), x, y, angle, attackable, mobility)
+
+
+def export_binary(maze):
+    """Export maze data to a bytes object in the binary format."""
+    walls, hero, enemies, bullets = export_state(maze)
+    rows, columns = len(walls), len(walls[0]) if walls else 0
+    bitmap, length = pack_walls(walls)
+    data = [HEADER.pack(rows, columns, len(enemies), len(bullets),
+                        maze.get_score()),
+            bitmap.to_bytes(length, 'big'), pack_hero(hero)]
+    for _, (color, x, y, angle) in enemies + bullets:
+        data.append(OBJECT.pack(color.encode(), x, y, angle))
+    return b''.join(data)
+
+
+class DeltaExporter:
+    """Object exporting maze data of a connection as delta frames.
+
+    A keyframe is sent first and after every rotation of the maze or
+    change of the visible range.  In between, only changes since the
+    previous frame are sent.
+
+    Attributes:
+        view (tuple): rotation and size of the walls of the last frame
+        walls (int): wall bitmap of the last frame
+        ids (dict): identifiers of the last exported enemies and bullets
+        records (dict): last exported records by identifiers
+        next_id (int): identifier to be given to the next new object
+    """
+    def __init__(self):
+        self.view, self.walls = None, 0
+        self.ids, self.records = {}, {}
+        self.next_id = 0
+
+    def track(self, enemies, bullets):
+        """Identify the given objects and return the lists of new and
+        old ones, as tuples of identifier, whether the object is an
+        enemy and its record.
+        """
+        ids, records, new, old = {}, {}, [], []
+        for group in enemies, bullets:
+            for obj, record in group:
+                i = self.ids.get(obj)
+                if i is None:
+                    new.append((obj, group is enemies, record))
+                else:
+                    ids[obj], records[i] = i, record
+                    old.append((i, group is enemies, record))
+        for j, (obj, is_enemy, record) in enumerate(new):
+            while self.next_id in records:
+                self.next_id = (self.next_id+1) & 0xffff
+            ids[obj], records[self.next_id] = self.next_id, record
+            new[j] = self.next_id, is_enemy, record
+        self.ids, self.records = ids, records
+        return new, old
+
+    def __call__(self, maze):
+        """Export maze data to a bytes object."""
+        walls, hero, enemies, bullets = export_state(maze)
+        rows, columns = len(walls), len(walls[0]) if walls else 0
+        bitmap, length = pack_walls(walls)
+        view = maze.rotatex, maze.rotatey, rows, columns
+        changes, records = bitmap ^ self.walls, self.records
+        self.walls = bitmap
+
+        if view != self.view:
+            self.view, self.ids = view, {}
+            new, old = self.track(enemies, bullets)
+            data = [b'K', HEADER.pack(rows, columns, len(enemies),
+                                      len(bullets), maze.get_score()),
+                    bitmap.to_bytes(length, 'big'), pack_hero(hero)]
+            for i, _, (color, x, y, angle) in new:
+                data.append(KEYED.pack(i, color.encode(), x, y, angle))
+            return b''.join(data)
+
+        toggled = []
+        while changes:
+            bit = changes & -changes
+            toggled.append(length*8 - bit.bit_length())
+            changes ^= bit
+        new, old = self.track(enemies, bullets)
+        removed = [i for i in records if i not in self.records]
+        enemies, bullets, moved = [], [], []
+        for i, is_enemy, (color, x, y, angle) in old:
+            last = records[i]
+            if last == (color, x, y, angle): continue
+            dx, dy = x - last[1], y - last[2]
+            if -128 <= dx < 128 and -128 <= dy < 128:
+                moved.append(MOVED.pack(i, color.encode(), dx, dy,
+                                        angle - last[3]))
+            else:   # reset the object
+                new.append((i, is_enemy, (color, x, y, angle)))
+        for i, is_enemy, (color, x, y, angle) in new:
+            (enemies if is_enemy else bullets).append(
+                KEYED.pack(i, color.encode(), x, y, angle))
+
+        data = [b'D', DELTA.pack(maze.get_score(), len(toggled), len(removed),
+                                 len(enemies), len(bullets), len(moved)),
+                pack_hero(hero)]
+        data.extend(INDEX.pack(i) for i in toggled + removed)
+        data.extend(enemies + bullets + moved)
+        return b''.join(data)
+
+
+# Factories of exporters which clients can switch to by sending their names
+PROTOCOLS = {'text': lambda: export_text, 'binary': lambda: export_binary,
+             'delta': DeltaExporter}
@@ -0,0 +1,214 @@
+# -*- coding: utf-8 -*-
+# replay.py - module for recording and replaying games
+# Copyright (C) 2017, 2018  Nguyễn Gia Phong
+#
+# This file is part of Brutal Maze.
+#
+# Brutal Maze is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# Brutal Maze is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with Brutal Maze.  If not, see <https://www.gnu.org/licenses/>.
+
+__doc__ = 'Brutal Maze module for recording and replaying games'
+
+from argparse import ArgumentParser
+from struct import Struct
+from time import perf_counter
+
+from .maze import Maze
+
+# Replays start with MAGIC, followed by events, each of which is a tag
+# byte optionally followed by its data.  Tags below 36 are control
+# inputs, encoded as move*4 + attack in the same way as remote control
+# commands, with CHANGED_ANGLE set if the new angle follows.  Since
+# games are deterministic given their seeds, nothing else is recorded,
+# except for losses forced from outside the game, e.g. by disconnection.
+MAGIC = b'BMR\x01'
+CHANGED_ANGLE = 0x40
+UPDATE = 0x80   # the maze is updated
+FPS = 0x81      # frame rate of following controls and updates changes
+RESIZE = 0x82   # display is resized
+NEW_GAME = 0x83     # a new game starts
+LOSE = 0x84     # the hero loses
+ANGLE = Struct('!d')        # angle (in radians)
+RATE = Struct('!d')         # frame rate
+SIZE = Struct('!HH')        # width, height
+GAME = Struct('!qdHH')      # seed, frame rate, width, height
+
+
+class Recorder:
+    """Object writing inputs of games to a replay file.
+
+    Attributes:
+        file (file object): the replay file opened in binary mode
+        angle (float): angle of the last control input
+        fps (float): frame rate of the last event
+    """
+    def __init__(self, file):
+        self.file, self.angle, self.fps = file, None, None
+        self.file.write(MAGIC)
+
+    def new_game(self, maze):
+        """Record the start of a new game of the maze."""
+        self.file.write(bytes([NEW_GAME]))
+        self.file.write(GAME.pack(maze.seed, maze.fps, maze.w, maze.h))
+        self.angle = None
+
+    def resize(self, size):
+        """Record the display being resized."""
+        self.file.write(bytes([RESIZE]) + SIZE.pack(*size))
+
+    def set_fps(self, fps):
+        """Record the frame rate if it has changed."""
+        if fps == self.fps: return
+        self.file.write(bytes([FPS]) + RATE.pack(fps))
+        self.fps = fps
+
+    def control(self, fps, x, y, angle, firing, slashing):
+        """Record the control input at the given frame rate."""
+        self.set_fps(fps)
+        tag = ((y+1)*3 + x+1)*4 + bool(firing) + bool(slashing)*2
+        if angle == self.angle:
+            self.file.write(bytes([tag]))
+        else:
+            self.file.write(bytes([tag | CHANGED_ANGLE]) + ANGLE.pack(angle))
+            self.angle = angle
+
+    def update(self, fps):
+        """Record the maze being updated at the given frame rate."""
+        self.set_fps(fps)
+        self.file.write(bytes([UPDATE]))
+
+    def lose(self):
+        """Record the hero losing."""
+        self.file.write(bytes([LOSE]))
+
+    def flush(self):
+        """Write buffered events of the replay to the file."""
+        self.file.flush()
+
+    def close(self):
+        """Close the replay file."""
+        self.file.close()
+
+
+def read(data):
+    """Yield events of the replay in the given bytes as tuples of their
+    tags and data.
+    """
+    if data[:len(MAGIC)] != MAGIC: raise ValueError('not a replay')
+    i = len(MAGIC)
+    while i < len(data):
+        tag = data[i]
+        i += 1
+        if tag in (UPDATE, LOSE):
+            yield tag,
+            continue
+        elif tag == FPS:
+            struct = RATE
+        elif tag == RESIZE:
+            struct = SIZE
+        elif tag == NEW_GAME:
+            struct = GAME
+        elif tag & CHANGED_ANGLE:
+            struct = ANGLE
+        else:
+            yield tag, None
+            continue
+        yield (tag,) + struct.unpack_from(data, i)
+        i += struct.size
+
+
+class Player:
+    """Object simulating games of a replay again, without waiting for
+    the wall clock.
+
+    Attributes:
+        maze (Maze): the maze
+        canvas (Canvas): canvas drawing the maze, if any
+        every (int): number of frames between drawn ones, 0 for none
+        fps (float): current frame rate
+        frames (int): number of frames of the current game
+    """
+    def __init__(self, every=0):
+        self.maze = self.canvas = None
+        self.every, self.fps, self.frames = every, None, 0
+
+    def resize(self, size):
+        """Resize the maze, along with the canvas if there is one."""
+        if size == (self.maze.w, self.maze.h): return
+        (self.maze if self.canvas is None else self.canvas).resize(size)
+
+    def new_game(self, seed, fps, w, h):
+        """Start a new game on the maze."""
+        self.frames = 0
+        if self.maze is None:
+            self.maze = Maze(fps, (w, h), seed)
+            if self.every:  # Pygame is only needed for drawing
+                from .graphics import Canvas
+                self.canvas = Canvas(self.maze)
+        else:
+            self.maze.fps = fps
+            self.resize((w, h))
+            self.maze.reinit(seed)
+
+    def play(self, data):
+        """Replay the given bytes, yielding the maze at the end of
+        each game in which it is updated.
+        """
+        angle = None
+        for event in read(data):
+            tag = event[0]
+            if tag == NEW_GAME:
+                if self.frames: yield self.maze
+                self.new_game(*event[1:])
+            elif tag == FPS:
+                self.fps = event[1]
+            elif tag == RESIZE:
+                self.resize(event[1:])
+            elif tag == UPDATE:
+                self.maze.update(self.fps)
+                self.frames += 1
+                if self.every and self.frames % self.every == 0:
+                    self.canvas.draw()
+            elif tag == LOSE:
+                self.maze.lose()
+            else:
+                if event[1] is not None: angle = event[1]
+                move, attack = divmod(tag & ~CHANGED_ANGLE, 4)
+                y, x = (i - 1 for i in divmod(move, 3))
+                self.maze.move(x, y, self.fps)
+                self.maze.hero.update_angle(angle)
+                self.maze.hero.firing = attack & 1
+                self.maze.hero.slashing = attack >> 1
+        if self.frames: yield self.maze
+
+
+def main():
+    """Replay a recorded file and print the outcome of every game."""
+    parser = ArgumentParser(usage='%(prog)s [options] PATH')
+    parser.add_argument('path', metavar='PATH', help='replay file')
+    parser.add_argument(
+        '-e', '--every', type=int, default=0, metavar='N',
+        help='draw every N-th frame on screen (default: nothing is drawn)')
+    args = parser.parse_args()
+    with open(args.path, 'rb') as f: data = f.read()
+
+    player, start = Player(args.every), perf_counter()
+    for i, maze in enumerate(player.play(data)):
+        now = perf_counter()
+        print('Game {}: seed {}, scored {} points in {} frames ({:.0f} fps)'
+              .format(i, maze.seed, maze.get_score(), player.frames,
+                      player.frames / (now-start)))
+        start = now
+
+
+if __name__ == '__main__': main()
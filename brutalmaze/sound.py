@@ -0,0 +1,93 @@
+# -*- coding: utf-8 -*-
+# sound.py - module for playing sound effects
+# Copyright (C) 2017, 2018  Nguyễn Gia Phong
+#
+# This file is part of Brutal Maze.
+#
+# Brutal Maze is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# Brutal Maze is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with Brutal Maze.  If not, see <https://www.gnu.org/licenses/>.
+
+__doc__ = 'Brutal Maze module for playing sound effects'
+
+from math import cos
+
+import pygame
+from pygame.mixer import Sound
+
+CHANNELS = 16   # number of sound effects which can be played at once
+MIN_VOLUME = 1.0 / 64   # sound effects quieter than this are not played
+
+
+class Mixer:
+    """Object playing sound effects on a fixed number of channels.
+
+    Each sound effect is only loaded the first time it is played.  When
+    all channels are busy, the quietest sound effect is stopped to play
+    a louder one, otherwise the new one is dropped.
+
+    Attributes:
+        size (int): number of channels
+        sounds (dict): loaded sound effects by their paths
+        channels (list of pygame.mixer.Channel): channels of the pool
+        volumes (list of float): volumes the channels were started at
+    """
+    def __init__(self, size=CHANNELS):
+        self.size, self.sounds = size, {}
+        self.channels, self.volumes = [], []
+
+    def load(self, path):
+        """Return the sound effect in the given file."""
+        try:
+            return self.sounds[path]
+        except KeyError:
+            self.sounds[path] = sound = Sound(path)
+            return sound
+
+    def get_channel(self, volume):
+        """Return an idle channel, or the busy one playing the quietest
+        sound effect if it is quieter than the given volume, or None.
+        """
+        # The mixer is reset to its default number of channels every
+        # time it is initialized, e.g. when the game is unmuted.
+        if pygame.mixer.get_num_channels() != self.size:
+            pygame.mixer.set_num_channels(self.size)
+            self.channels = [pygame.mixer.Channel(i) for i in range(self.size)]
+            self.volumes = [0.0] * self.size
+        quietest, lowest = None, volume
+        for i, channel in enumerate(self.channels):
+            if not channel.get_busy():
+                quietest = i
+                break
+            if self.volumes[i] < lowest: quietest, lowest = i, self.volumes[i]
+        if quietest is None: return None
+        self.volumes[quietest] = volume
+        return self.channels[quietest]
+
+    def play(self, path, volume=1.0, angle=None):
+        """Play the sound effect in the given file at the given volume,
+        from the given angle if any.
+        """
+        if volume < MIN_VOLUME or pygame.mixer.get_init() is None: return
+        channel = self.get_channel(volume)
+        if channel is None: return
+        channel.play(self.load(path))
+        if angle is None:
+            channel.set_volume(volume)
+        else:
+            delta = cos(angle)
+            volumes = [volume * (1-delta), volume * (1+delta)]
+            for i, v in enumerate(volumes):
+                if v > 1:
+                    volumes[i - 1] += v - 1
+                    volumes[i] = 1.0
+            channel.set_volume(*volumes)
@@ -0,0 +1,119 @@
+# -*- coding: utf-8 -*-
+# stats.py - module for collecting statistics of frames
+# Copyright (C) 2017, 2018  Nguyễn Gia Phong
+#
+# This file is part of Brutal Maze.
+#
+# Brutal Maze is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# Brutal Maze is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with Brutal Maze.  If not, see <https://www.gnu.org/licenses/>.
+
+__doc__ = 'Brutal Maze module for collecting statistics of frames'
+
+from bisect import bisect_left
+from time import perf_counter
+
+# Upper bounds of buckets of histograms, in microseconds
+BUCKETS = tuple(2 ** i for i in range(21))
+# Weight of the latest duration in recent averages
+RECENT = 1.0 / 32
+
+
+class Histogram:
+    """Object accumulating durations of a phase.
+
+    Attributes:
+        count (int): number of durations
+        total (float): sum of durations (in us)
+        recent (float): exponential moving average of durations (in us)
+        max (float): longest duration (in us)
+        buckets (list of int): numbers of durations no longer than
+            the corresponding bounds in BUCKETS, but longer than
+            the previous ones, followed by the number of longer ones
+    """
+    def __init__(self):
+        self.count, self.total, self.recent, self.max = 0, 0.0, 0.0, 0.0
+        self.buckets = [0] * (len(BUCKETS)+1)
+
+    def add(self, duration):
+        """Add the duration (in us)."""
+        self.count += 1
+        self.total += duration
+        self.recent += (duration-self.recent) * RECENT
+        if duration > self.max: self.max = duration
+        self.buckets[bisect_left(BUCKETS, duration)] += 1
+
+    def export(self):
+        """Return the statistics as a dict, with bounds of buckets
+        left out.
+        """
+        return {'count': self.count, 'total': self.total,
+                'mean': self.total / self.count if self.count else 0.0,
+                'recent': self.recent, 'max': self.max,
+                'buckets': self.buckets[:]}
+
+
+class Stats:
+    """Object collecting timings and counters of frames.
+
+    Phases are timed as laps: start is called at the beginning of
+    a sequence of phases and lap at the end of each of them.
+
+    Attributes:
+        timers (dict): Histogram of each phase by its name
+        counters (dict): counters by their names
+        last (float): time of the end of the last lap (in seconds)
+    """
+    def __init__(self):
+        self.timers, self.counters, self.last = {}, {}, perf_counter()
+
+    def start(self):
+        """Start timing phases."""
+        self.last = perf_counter()
+
+    def lap(self, phase):
+        """Record the time since the last lap as the phase's duration."""
+        now = perf_counter()
+        try:
+            self.timers[phase].add((now-self.last) * 1e6)
+        except KeyError:
+            self.timers[phase] = Histogram()
+            self.timers[phase].add((now-self.last) * 1e6)
+        self.last = now
+
+    def set(self, name, value):
+        """Set the counter to the value."""
+        self.counters[name] = value
+
+    def add(self, name, value=1):
+        """Add the value to the counter."""
+        self.counters[name] = self.counters.get(name, 0) + value
+
+    def export(self):
+        """Return the statistics, including bounds of buckets of
+        histograms, as a dict.
+        """
+        return {'timers': {phase: histogram.export()
+                           for phase, histogram in self.timers.copy().items()},
+                'counters': self.counters.copy(), 'buckets': BUCKETS}
+
+    def report(self):
+        """Return the statistics as a list of lines for humans to read,
+        with recent averages and longest durations of phases.
+        """
+        lines = ['{}: {:.0f} us (max {:.0f})'.format(
+                     phase, histogram.recent, histogram.max)
+                 for phase, histogram in sorted(self.timers.items())]
+        lines.extend('{}: {:g}'.format(name, value)
+                     for name, value in sorted(self.counters.items()))
+        return lines
+
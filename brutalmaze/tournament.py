@@ -0,0 +1,193 @@
+# -*- coding: utf-8 -*-
+# tournament.py - module for evaluating bots over many games
+# Copyright (C) 2017, 2018  Nguyễn Gia Phong
+#
+# This file is part of Brutal Maze.
+#
+# Brutal Maze is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# Brutal Maze is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with Brutal Maze.  If not, see <https://www.gnu.org/licenses/>.
+
+__doc__ = 'Brutal Maze module for evaluating bots over many games'
+
+import json
+import random
+from argparse import ArgumentParser, FileType
+from importlib import import_module
+from importlib.util import module_from_spec, spec_from_file_location
+from multiprocessing import Pool, cpu_count, current_process
+from time import perf_counter
+
+from .env import Environment
+from .protocol import PROTOCOLS
+
+# Referee of the current worker process, set up by init
+referee = None
+
+
+def load(bot):
+    """Return the function of the bot given as MODULE[:FUNCTION], where
+    MODULE is either the name of a module or the path to a Python file
+    and FUNCTION defaults to decide.
+    """
+    module, sep, function = bot.rpartition(':')
+    if not sep or not function.isidentifier():
+        module, function = bot, 'decide'
+    if module.endswith('.py'):
+        spec = spec_from_file_location('bot', module)
+        namespace = module_from_spec(spec)
+        spec.loader.exec_module(namespace)
+    else:
+        namespace = import_module(module)
+    return getattr(namespace, function)
+
+
+class Referee(Environment):
+    """Environment playing games of a bot, whose observations are
+    frames in the given format.
+
+    The bot is called with the data of each frame and returns
+    a command of remote control, as a string or bytes.
+
+    Attributes:
+        bot (function): the bot
+        frames (int): maximum number of frames of each game
+        protocol (str): name of the format of frames in PROTOCOLS
+        export (function): exporter of frames of the current game
+    """
+    def __init__(self, bot, size, fps, frames, protocol):
+        Environment.__init__(self, size, fps)
+        self.bot, self.frames, self.protocol = bot, frames, protocol
+        self.export = PROTOCOLS[protocol]()
+
+    def observation(self):
+        """Return the data of the current frame."""
+        return self.export(self.maze)
+
+    def play(self, seed):
+        """Play a game with the given seed and return its result
+        as a dict.
+        """
+        self.export = PROTOCOLS[self.protocol]()
+        data, dead = self.reset(seed), False
+        random.seed(seed)   # for bots making random decisions
+
+        frames, start = 0, perf_counter()
+        while frames < self.frames and not dead:
+            command = self.bot(data)
+            try:
+                if isinstance(command, bytes): command = command.decode()
+                move, angle, attack = map(int, command.split())
+            except ValueError:  # invalid input
+                self.maze.lose()
+                break
+            data, _, dead, _ = self.step(move, angle, attack)
+            frames += 1
+        time = perf_counter() - start
+        return {'seed': seed, 'worker': current_process().name,
+                'score': self.maze.get_score(), 'frames': frames,
+                'survival': frames / self.fps, 'dead': self.maze.hero.dead,
+                'time': time, 'fps': frames / time if time else 0.0}
+
+
+def init(bot, size, fps, frames, protocol):
+    """Set up the referee of the worker process."""
+    global referee
+    referee = Referee(load(bot), size, fps, frames, protocol)
+
+
+def play(seed):
+    """Play a game with the given seed in the worker process."""
+    return referee.play(seed)
+
+
+def summarize(games):
+    """Return the aggregated results of the games as a dict."""
+    scores = [game['score'] for game in games]
+    survivals = [game['survival'] for game in games]
+    frames, time = sum(game['frames'] for game in games), sum(
+        game['time'] for game in games)
+    return {'games': len(games), 'score': sum(scores) / len(scores),
+            'min_score': min(scores), 'max_score': max(scores),
+            'survival': sum(survivals) / len(survivals),
+            'min_survival': min(survivals), 'max_survival': max(survivals),
+            'frames': frames, 'fps': frames / time if time else 0.0}
+
+
+def main():
+    """Run games of a bot in parallel and print their outcome."""
+    parser = ArgumentParser(usage='%(prog)s [options] BOT')
+    parser.add_argument(
+        'bot', metavar='BOT',
+        help='MODULE[:FUNCTION] of the bot, where MODULE is a module name'
+             ' or a path to a Python file (default FUNCTION: decide)')
+    parser.add_argument('-g', '--games', type=int, default=10,
+                        help='number of games (default: 10)')
+    parser.add_argument(
+        '-j', '--jobs', type=int, default=cpu_count(),
+        help='number of worker processes (default: {})'.format(cpu_count()))
+    parser.add_argument(
+        '--seed', type=int, default=42,
+        help='seed of the first game, incremented for each next one'
+             ' (default: 42)')
+    parser.add_argument(
+        '-s', '--size', type=int, nargs=2, default=(640, 480),
+        metavar=('X', 'Y'), help='size of the maze (default: 640x480)')
+    parser.add_argument('-f', '--fps', type=float, default=60.0,
+                        help='simulated frame rate (default: 60)')
+    parser.add_argument(
+        '-n', '--frames', type=int, default=36000,
+        help='maximum number of frames of each game (default: 36000)')
+    parser.add_argument(
+        '-p', '--protocol', choices=sorted(PROTOCOLS), default='text',
+        help='format of frames (default: text)')
+    parser.add_argument('-o', '--output', type=FileType('w'), metavar='PATH',
+                        help='where results are written as JSON')
+    args = parser.parse_args()
+    load(args.bot)  # fail early on bots which cannot be loaded
+
+    games, seeds = [], range(args.seed, args.seed + args.games)
+    pool = Pool(args.jobs, init, (args.bot, tuple(args.size), args.fps,
+                                  args.frames, args.protocol))
+    start = perf_counter()
+    with pool:
+        for game in pool.imap(play, seeds):
+            print('Game {}: seed {}, scored {} points, {} {:.1f}s'
+                  ' ({} frames, {:.0f} fps)'.format(
+                      len(games), game['seed'], game['score'],
+                      'died after' if game['dead'] else 'survived',
+                      game['survival'], game['frames'], game['fps']))
+            games.append(game)
+    time = perf_counter() - start
+    if not games: return
+
+    workers = {}
+    for game in games: workers.setdefault(game['worker'], []).append(game)
+    workers = {name: summarize(results) for name, results in workers.items()}
+    total = summarize(games)
+    for name, result in sorted(workers.items()) + [('Total', total)]:
+        print('{}: {} games, {:.1f} points (min {}, max {}), survived'
+              ' {:.1f}s (min {:.1f}, max {:.1f}), {:.0f} fps'.format(
+                  name, result['games'], result['score'],
+                  result['min_score'], result['max_score'],
+                  result['survival'], result['min_survival'],
+                  result['max_survival'], result['fps']))
+    print('Simulated {} frames in {:.1f}s ({:.0f} fps)'.format(
+        total['frames'], time, total['frames'] / time))
+    if args.output is not None:
+        json.dump({'bot': args.bot, 'games': games, 'workers': workers,
+                   'total': total, 'time': time},
+                  args.output, indent=2, sort_keys=True)
+        args.output.write('\n')
+
+
+if __name__ == '__main__': main()
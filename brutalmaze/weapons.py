@@ -19,41 +19,67 @@
 
 __doc__ = 'Brutal Maze module for weapon classes'
 
-from math import cos, sin
+import numpy as np
 
 from .constants import (BULLET_LIFETIME, SFX_SHOT_ENEMY, SFX_SHOT_HERO,
-                        SFX_MISSED, BULLET_SPEED, ENEMY_HP, TANGO, BG_COLOR)
-from .misc import regpoly, fill_aapolygon
+                        BULLET_SPEED, ENEMY_HP, TANGO, BG_COLOR, ENEMIES)
+
+BULLET_COLORS = ENEMIES + ['Aluminium']
+ALUMINIUM = BULLET_COLORS.index('Aluminium')
+
+
+def get_sfx_hit(color):
+    """Return the sound effect of a bullet of the given color index
+    hitting its target.
+    """
+    return SFX_SHOT_ENEMY if color == ALUMINIUM else SFX_SHOT_HERO
 
 
 class Bullet:
-    """Object representing a bullet.
+    """Object representing a bullet, as a view of a BulletPool.
+
+    Bullets are equal if they are views of the same bullet, even after
+    the pool has been compacted.
 
     Attributes:
-        surface (pygame.Surface): the display to draw on
-        x, y (int): coordinates of the center of the bullet (in pixels)
-        angle (float): angle of the direction the bullet pointing (in radians)
-        color (str): bullet's color name
-        fall_time (int): time until the bullet fall down
-        sfx_hit (pygame.mixer.Sound): sound effect indicating target was hit
-        sfx_missed (pygame.mixer.Sound): sound effect indicating a miss shot
+        pool (BulletPool): the pool the bullet is stored in
+        index (int): index of the bullet in the pool
+        serial (int): unique number of the bullet in the pool
     """
-    def __init__(self, surface, x, y, angle, color):
-        self.surface = surface
-        self.x, self.y, self.angle, self.color = x, y, angle, color
-        self.fall_time = BULLET_LIFETIME
-        if color == 'Aluminium':
-            self.sfx_hit = SFX_SHOT_ENEMY
-        else:
-            self.sfx_hit = SFX_SHOT_HERO
-        self.sfx_missed = SFX_MISSED
+    def __init__(self, pool, index):
+        self.pool, self.index = pool, index
+        self.serial = pool.serial[index]
 
-    def update(self, fps, distance):
-        """Update the bullet."""
-        s = distance * BULLET_SPEED / fps
-        self.x += s * cos(self.angle)
-        self.y += s * sin(self.angle)
-        self.fall_time -= 1000.0 / fps
+    def __eq__(self, other):
+        if not isinstance(other, Bullet): return NotImplemented
+        return self.pool is other.pool and self.serial == other.serial
+
+    def __hash__(self): return hash(self.serial)
+
+    @property
+    def x(self):
+        """x-coordinate of the center of the bullet (in pixels)."""
+        return self.pool.x[self.index]
+
+    @property
+    def y(self):
+        """y-coordinate of the center of the bullet (in pixels)."""
+        return self.pool.y[self.index]
+
+    @property
+    def angle(self):
+        """Angle of the direction the bullet pointing (in radians)."""
+        return self.pool.angle[self.index]
+
+    @property
+    def color(self):
+        """Bullet's color name."""
+        return BULLET_COLORS[self.pool.color[self.index]]
+
+    @property
+    def fall_time(self):
+        """Time until the bullet fall down (in ms)."""
+        return self.pool.fall_time[self.index]
 
     def get_color(self):
         """Return current color of the enemy."""
@@ -63,16 +89,64 @@ class Bullet:
         except IndexError:
             return BG_COLOR
 
-    def draw(self, radius):
-        """Draw the bullet."""
-        pentagon = regpoly(5, radius, self.angle, self.x, self.y)
-        fill_aapolygon(self.surface, pentagon, self.get_color())
+    def draw(self, surface, radius, sprites, dx=0.0, dy=0.0):
+        """Draw the bullet, moved by (dx, dy), on the surface using
+        the given SpriteCache.
+        """
+        sprites.draw(surface, 5, radius, self.angle,
+                     self.x + dx, self.y + dy, self.get_color())
+
+
+class BulletPool:
+    """Object storing flying bullets as arrays, one element per bullet.
+
+    Iterating over the pool gives Bullet views of the bullets.
+
+    Attributes:
+        x, y (numpy.ndarray): coordinates of the centers (in pixels)
+        dx, dy (numpy.ndarray): cosines and sines of the angles
+        angle (numpy.ndarray): angles of the directions (in radians)
+        fall_time (numpy.ndarray): time until the bullets fall down (in ms)
+        color (numpy.ndarray): indices of bullets' color in BULLET_COLORS
+        serial (numpy.ndarray): unique numbers of the bullets
+        next_serial (int): number to be given to the next bullet
+    """
+    FIELDS = 'x', 'y', 'dx', 'dy', 'angle', 'fall_time', 'color', 'serial'
+
+    def __init__(self):
+        self.x, self.y, self.dx, self.dy = (np.empty(0) for _ in range(4))
+        self.angle, self.fall_time = np.empty(0), np.empty(0)
+        self.color = np.empty(0, np.int8)
+        self.serial = np.empty(0, np.int64)
+        self.next_serial = 0
+
+    def __len__(self): return len(self.x)
+
+    def __iter__(self):
+        for i in range(len(self)): yield Bullet(self, i)
+
+    def append(self, x, y, angle, color):
+        """Add a bullet at (x, y) pointing at the given angle."""
+        values = (x, y, np.cos(angle), np.sin(angle), angle, BULLET_LIFETIME,
+                  BULLET_COLORS.index(color), self.next_serial)
+        for field, value in zip(self.FIELDS, values):
+            array = getattr(self, field)
+            setattr(self, field, np.append(array, value).astype(array.dtype))
+        self.next_serial += 1
+
+    def keep(self, mask):
+        """Remove the bullets not selected by the boolean mask."""
+        for field in self.FIELDS:
+            setattr(self, field, getattr(self, field)[mask])
+
+    def update(self, fps, distance):
+        """Update the bullets."""
+        s = distance * BULLET_SPEED / fps
+        self.x += s * self.dx
+        self.y += s * self.dy
+        self.fall_time -= 1000.0 / fps
 
     def place(self, x, y):
-        """Move the bullet by (x, y) (in pixels)."""
+        """Move the bullets by (x, y) (in pixels)."""
         self.x += x
         self.y += y
-
-    def get_distance(self, x, y):
-        """Return the from the center of the bullet to the point (x, y)."""
-        return ((self.x-x)**2 + (self.y-y)**2)**0.5
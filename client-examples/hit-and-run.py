@@ -3,13 +3,10 @@ from math import inf, atan2, degrees
 from socket import socket
 from random import randint
 
-clientsocket = socket()
-clientsocket.connect(('localhost', 8089))
-while True:
-    length = clientsocket.recv(7).decode()
-    if length in ('', '0000000'): break     # connection closed or game over
-    l = clientsocket.recv(int(length)).decode().split()
-    data = iter(l)
+
+def decide(data):
+    """Return the command answering the given frame in text format."""
+    data = iter(data.decode().split())
     nh, ne, nb, score = (int(next(data)) for _ in range(4))
     maze = [[bool(int(i)) for i in next(data)] for _ in range(nh)]
     hp = (lambda c: 0 if c == 48 else 123 - c)(ord(next(data)))
@@ -36,5 +33,14 @@ while True:
         move, angle, attack = 8, ha, 2
     else:
         attack = 1
-    clientsocket.send('{} {} {}'.format(move, angle, attack).encode())
-clientsocket.close()
+    return '{} {} {}'.format(move, angle, attack)
+
+
+if __name__ == '__main__':
+    clientsocket = socket()
+    clientsocket.connect(('localhost', 8089))
+    while True:
+        length = clientsocket.recv(7).decode()
+        if length in ('', '0000000'): break  # connection closed or game over
+        clientsocket.send(decide(clientsocket.recv(int(length))).encode())
+    clientsocket.close()
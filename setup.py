@@ -24,9 +24,15 @@ setup(
         'Natural Language :: English',
         'Operating System :: OS Independent',
         'Programming Language :: Python',
+        'Programming Language :: Python :: 3',
+        'Programming Language :: Python :: 3 :: Only',
         'Topic :: Games/Entertainment :: Arcade'],
     keywords='pygame action-game arcade-game maze socket-server ai-challenges',
     packages=['brutalmaze'],
-    install_requires=['appdirs', 'pygame>=1.9'],
+    python_requires='>=3.8',
+    install_requires=['appdirs', 'numpy', 'pygame>=1.9'],
     package_data={'brutalmaze': ['icon.png', 'soundfx/*.ogg', 'settings.ini']},
-    entry_points={'gui_scripts': ['brutalmaze = brutalmaze.game:main']})
+    entry_points={
+        'gui_scripts': ['brutalmaze = brutalmaze.game:main'],
+        'console_scripts': [
+            'brutalmaze-bench = brutalmaze.tournament:main']})